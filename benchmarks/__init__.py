@@ -0,0 +1,6 @@
+"""
+benchmarks of juntagrico_contribution on synthetic data.
+not part of the distributed package. run from the repository root with
+
+    python -m benchmarks [--sizes 100 1000] [--repeat 5] [--output results.json] [--compare old.json]
+"""
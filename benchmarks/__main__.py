@@ -0,0 +1,112 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import django
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=(
+        'Time the queries of juntagrico_contribution on synthetic data of several sizes '
+        'and write the wall times and query counts to a JSON file.'
+    ))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000], help='Numbers of subscriptions.')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case, after one warm-up run.')
+    parser.add_argument('--cases', nargs='+', help='Run only these cases.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the data generator.')
+    parser.add_argument('--output', default='benchmark-results.json', help='File to write the results to.')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with.')
+    return parser.parse_args()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    from django.core.management import call_command
+    from django.db import connection
+
+    from benchmarks.cases import CASES, measure
+    from benchmarks.data import generate
+
+    cases = {name: case for name, case in CASES.items() if not args.cases or name in args.cases}
+    results = []
+    for size in args.sizes:
+        call_command('flush', interactive=False, verbosity=0)
+        dataset = generate(size, args.seed)
+        for name, case in cases.items():
+            runner = case(dataset)
+            if runner is None:
+                print(f'{name:>16} {size:>7}: skipped', file=sys.stderr)
+                continue
+            result = {'case': name, 'size': size, **measure(runner, args.repeat)}
+            print(f'{name:>16} {size:>7}: {result["median"] * 1000:9.1f} ms {result["queries"]:5} queries',
+                  file=sys.stderr)
+            results.append(result)
+    return {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+
+def compare(old, new):
+    """
+    print the change of the median wall time and of the query count for each case and size in both runs
+    """
+    previous = {(result['case'], result['size']): result for result in old['results']}
+    print(f'compared with {old["meta"].get("revision")} of {old["meta"]["date"]}')
+    for result in new['results']:
+        before = previous.get((result['case'], result['size']))
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        print(
+            f'{result["case"]:>16} {result["size"]:>7}: '
+            f'{before["median"] * 1000:9.1f} -> {result["median"] * 1000:9.1f} ms ({ratio:5.2f}x), '
+            f'{before["queries"]:5} -> {result["queries"]:5} queries'
+        )
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'testsettings')
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    # never touch the development database
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        results = run(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+the timed operations. each case returns a callable that performs the operation once.
+"""
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from juntagrico_contribution.models import BillTransferJob
+from juntagrico_contribution.statistics import RoundStatistics
+
+
+# upper bound of the runs of the select case
+SELECT_RUNS = 50
+# default of run_bill_transfer_jobs
+CHUNK_SIZE = 200
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def logged_in_client(member):
+    client = Client()
+    client.force_login(member.user)
+    return client
+
+
+def get(client, url, data=None):
+    def run():
+        response = client.get(url, data)
+        if response.status_code != 200:
+            raise BenchmarkError(f'GET {url} returned {response.status_code}')
+    return run
+
+
+def summary(dataset):
+    return get(logged_in_client(dataset.admin), reverse('jcr:admin-summary', args=(dataset.round.pk,)))
+
+
+def details(dataset):
+    return get(logged_in_client(dataset.admin), reverse('jcr:admin-details-data'), {
+        'round': dataset.round.pk, 'draw': 1, 'start': 0, 'length': 25,
+    })
+
+
+def select(dataset):
+    """
+    each run, another primary member submits the first selection of their subscription.
+    a selection can not be lowered, so the same member can not submit repeatedly.
+    """
+    # log in outside of the timed runs
+    clients = iter([logged_in_client(member) for member in dataset.primary_members[:SELECT_RUNS]])
+    url = reverse('jcr:select')
+
+    def run():
+        client = next(clients, None)
+        if client is None:
+            raise BenchmarkError('not enough subscriptions without a selection, use a larger size or fewer repeats')
+        response = client.post(url, {'selection': dataset.options[1].pk})
+        if response.status_code != 302:
+            raise BenchmarkError(f'POST {url} returned {response.status_code}')
+    return run
+
+
+def round_statistics(dataset):
+    def run():
+        # the numbers of the summary page, as computed when the stored statistics are stale
+        RoundStatistics.compute(dataset.round)
+    return run
+
+
+def total_unselected(dataset):
+    def run():
+        # computed in SQL, without the cached prices
+        cache.clear()
+        dataset.round.get_total_unselected()
+    return run
+
+
+def bill_transfer(dataset):
+    if dataset.business_year is None:
+        return None
+
+    def run():
+        # a full transfer, as processed by the run_bill_transfer_jobs worker
+        job = BillTransferJob.objects.create(
+            round=dataset.round, business_year_id=dataset.business_year.pk,
+            bill_item_type_id=dataset.bill_item_type.pk, full=True,
+        )
+        while not job.process_chunk(CHUNK_SIZE):
+            pass
+    return run
+
+
+CASES = {
+    'summary': summary,
+    'details': details,
+    'select': select,
+    'statistics': round_statistics,
+    'total_unselected': total_unselected,
+    'bill_transfer': bill_transfer,
+}
+
+
+def measure(run, repeat):
+    """
+    run once to warm up, then repeat times.
+    :return: dict with the wall times in seconds and the number of queries of the last run
+    """
+    run()
+    times = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'max': max(times),
+        'queries': len(queries),
+    }
@@ -0,0 +1,217 @@
+"""
+synthetic juntagrico data for the benchmarks, created in bulk wherever juntagrico allows it.
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from juntagrico.entity.depot import Depot
+from juntagrico.entity.location import Location
+from juntagrico.entity.member import Member, SubscriptionMembership
+from juntagrico.entity.subs import Subscription, SubscriptionPart
+from juntagrico.entity.subtypes import SubscriptionProduct, SubscriptionSize, SubscriptionType
+
+from juntagrico_contribution.models import ContributionCondition, ContributionOption, ContributionRound, \
+    ContributionSelection
+
+# share of the subscriptions
+CO_MEMBERS = 0.3
+CANCELLED = 0.05
+DEACTIVATED = 0.05
+# share of the eligible subscriptions
+BIDS = 0.6
+OTHER_AMOUNTS = 0.1
+
+
+class Dataset:
+    """
+    objects created by generate that the benchmarks need
+    """
+
+    def __init__(self, size, admin, contribution_round, options, primary_members):
+        self.size = size
+        self.admin = admin
+        self.round = contribution_round
+        self.options = options
+        # primary members of the subscriptions that are subject to the round and have no selection yet
+        self.primary_members = primary_members
+        self.business_year = None
+        self.bill_item_type = None
+
+
+def create_members(emails):
+    users = User.objects.bulk_create([User(username=email) for email in emails])
+    return Member.objects.bulk_create([
+        Member(
+            user=user, email=email, first_name='Vorname', last_name=email.split('@')[0],
+            addr_street='Strasse 1', addr_zipcode='1234', addr_location='Ort', phone='000', confirmed=True,
+        )
+        for user, email in zip(users, emails)
+    ])
+
+
+def create_sub_types():
+    product = SubscriptionProduct.objects.create(name='Gemüse')
+    small = SubscriptionSize.objects.create(name='klein', long_name='Kleines Abo', units=1, product=product)
+    large = SubscriptionSize.objects.create(name='gross', long_name='Grosses Abo', units=2, product=product)
+    extra = SubscriptionProduct.objects.create(name='Eier', is_extra=True)
+    eggs = SubscriptionSize.objects.create(name='Eier', long_name='Eier', units=1, product=extra)
+
+    def create(name, size, price, **kwargs):
+        return SubscriptionType.objects.create(
+            name=name, long_name=name, size=size, price=price, required_assignments=5, required_core_assignments=1,
+            **kwargs
+        )
+
+    small_type = create('klein', small, 900)
+    large_type = create('gross', large, 1600)
+    eggs_type = create('Eier', eggs, 250, shares=0)
+    trial_type = create('Probe', small, 90, trial_days=30)
+    # mixed compositions, including duplicates, extras and trial parts
+    return [
+        (small_type,), (small_type,), (large_type,), (small_type, eggs_type), (large_type, eggs_type),
+        (small_type, small_type), (trial_type,), (small_type, trial_type),
+    ], [small_type, large_type, eggs_type]
+
+
+def create_round(sub_types):
+    small_type, large_type, eggs_type = sub_types
+    contribution_round = ContributionRound.objects.create(
+        name='Benchmark', description='Synthetische Beitragsrunde', target_amount=Decimal(1000000),
+        other_amount=True, status=ContributionRound.STATUS_ACTIVE,
+        cancellation_cutoff=datetime.date.today() - datetime.timedelta(days=30),
+    )
+    options = [
+        ContributionOption.objects.create(
+            round=contribution_round, name='Mindestpreis', multiplier=0.8, amount_rounding=10
+        ),
+        ContributionOption.objects.create(round=contribution_round, name='Richtpreis'),
+        ContributionOption.objects.create(
+            round=contribution_round, name='Solidarpreis', multiplier=1.25, amount_rounding=5
+        ),
+    ]
+    ContributionCondition.objects.bulk_create([
+        ContributionCondition(option=options[0], subscription_type=eggs_type, price=Decimal(250)),
+        ContributionCondition(option=options[2], subscription_type=large_type, price=Decimal(2100)),
+    ])
+    contribution_round.minimum_amount = options[0]
+    contribution_round.default_amount = options[1]
+    contribution_round.save()
+    return contribution_round, options
+
+
+def create_subscriptions(size, rng, compositions):
+    today = datetime.date.today()
+    long_ago = today - datetime.timedelta(days=400)
+    location = Location.objects.create(name='Depot', latitude='47.0', longitude='8.0')
+    members = create_members([f'benchmark{i}@example.org' for i in range(size)])
+    co_members = create_members([f'co{i}@example.org' for i in range(int(size * CO_MEMBERS))])
+    depot = Depot.objects.create(name='Depot', contact=members[0], weekday=1, location=location)
+
+    # Subscription inherits from Billable and cannot be bulk created
+    subscriptions = []
+    for member in members:
+        draw = rng.random()
+        dates = {}
+        if draw < DEACTIVATED:
+            dates = {'cancellation_date': long_ago, 'deactivation_date': today - datetime.timedelta(days=100)}
+        elif draw < DEACTIVATED + CANCELLED:
+            # cancelled before or after the cancellation cutoff of the round
+            dates = {'cancellation_date': today - datetime.timedelta(days=rng.choice([60, 1]))}
+        subscription = Subscription.objects.create(
+            depot=depot, creation_date=long_ago, start_date=long_ago, activation_date=long_ago, **dates
+        )
+        subscription.jcr_member = member
+        subscription.jcr_dates = dates
+        subscriptions.append(subscription)
+
+    memberships = [
+        SubscriptionMembership(member=subscription.jcr_member, subscription=subscription, join_date=long_ago)
+        for subscription in subscriptions
+    ]
+    memberships += [
+        SubscriptionMembership(member=member, subscription=subscription, join_date=long_ago)
+        for member, subscription in zip(co_members, rng.sample(subscriptions, len(co_members)))
+    ]
+    SubscriptionMembership.objects.bulk_create(memberships)
+    SubscriptionPart.objects.bulk_create([
+        SubscriptionPart(
+            subscription=subscription, type=sub_type, activation_date=long_ago,
+            cancellation_date=subscription.jcr_dates.get('cancellation_date'),
+            deactivation_date=subscription.jcr_dates.get('deactivation_date'),
+        )
+        for subscription in subscriptions
+        for sub_type in rng.choice(compositions)
+    ])
+    Subscription.objects.update(primary_member=Subquery(
+        SubscriptionMembership.objects.filter(subscription=OuterRef('pk')).order_by('pk').values('member')[:1]
+    ))
+    return members
+
+
+def create_selections(contribution_round, options, rng):
+    """
+    partial bidding: a share of the eligible subscriptions selects an option or another amount
+    :return: ids of the eligible subscriptions without a selection
+    """
+    prices = contribution_round.get_price_matrix()
+    bidders = rng.sample(sorted(prices), int(len(prices) * BIDS))
+    selections = []
+    for subscription_id in bidders:
+        if rng.random() < OTHER_AMOUNTS:
+            option = None
+            price = (prices.nominal(subscription_id) * Decimal(rng.uniform(1, 1.5))).quantize(Decimal('0.01'))
+        else:
+            option = rng.choice(options)
+            price = round(prices.get(subscription_id, option), 2)
+        selections.append(ContributionSelection(
+            round=contribution_round, subscription_id=subscription_id, selected_option=option,
+            price=price, contact_me=rng.random() < 0.1,
+        ))
+    ContributionSelection.objects.bulk_create(selections)
+    return set(prices) - set(bidders)
+
+
+def create_bills(dataset, members):
+    """
+    a bill per primary member in the current business year, if juntagrico_billing is installed
+    """
+    if not apps.is_installed('juntagrico_billing'):
+        return
+    from juntagrico_billing.models.bill import Bill, BillItemType, BusinessYear
+    today = datetime.date.today()
+    dataset.business_year = BusinessYear.objects.create(
+        start_date=today.replace(month=1, day=1), end_date=today.replace(month=12, day=31), name=str(today.year)
+    )
+    dataset.bill_item_type = BillItemType.objects.create(name='Beitrag', booking_account='1000')
+    Bill.objects.bulk_create([
+        Bill(business_year=dataset.business_year, member=member, bill_date=today, booking_date=today)
+        for member in members
+    ])
+
+
+@transaction.atomic
+def generate(size, seed=0):
+    """
+    create size subscriptions with their members and an active contribution round with options, conditions and bids.
+    :return: Dataset
+    """
+    rng = random.Random(seed)
+    admin = create_members(['admin@example.org'])[0]
+    User.objects.filter(pk=admin.user_id).update(is_staff=True, is_superuser=True)
+    compositions, sub_types = create_sub_types()
+    contribution_round, options = create_round(sub_types)
+    members = create_subscriptions(size, rng, compositions)
+    without_selection = create_selections(contribution_round, options, rng)
+    dataset = Dataset(size, admin, contribution_round, options, [
+        member for member in Member.objects.filter(subscription_primary__in=without_selection).order_by('pk')
+    ])
+    create_bills(dataset, members)
+    # bulk creation bypasses the invalidation of the cached prices and statistics
+    cache.clear()
+    return dataset
@@ -38,6 +38,25 @@ class RoundAdmin(SortableAdminBase, BaseAdmin):
         ),
     ]
     inlines = [OptionInline]
+    actions = ['recalculate_prices', 'preview_recalculate_prices']
+
+    def _recalculate_prices(self, request, queryset, dry_run):
+        for contribution_round in queryset:
+            changes = contribution_round.recalculate_prices(dry_run)
+            net = sum(new_price - old_price for _, old_price, new_price in changes)
+            if dry_run:
+                message = _('{}: {} Preise würden sich ändern, Differenz {:+.2f}')
+            else:
+                message = _('{}: {} Preise geändert, Differenz {:+.2f}')
+            self.message_user(request, message.format(contribution_round, len(changes), net))
+
+    @admin.action(description=_('Preise der Gebote neu berechnen'))
+    def recalculate_prices(self, request, queryset):
+        self._recalculate_prices(request, queryset, False)
+
+    @admin.action(description=_('Neuberechnung der Preise der Gebote prüfen'))
+    def preview_recalculate_prices(self, request, queryset):
+        self._recalculate_prices(request, queryset, True)
 
 
 class ConditionInline(admin.TabularInline):
@@ -8,3 +8,28 @@ class JuntagricoAppconfig(AppConfig):
     def ready(self):
         from juntagrico.util import addons
         addons.config.register_version(self.name)
+
+        from django.db.models import signals
+        from juntagrico.entity.subs import Subscription, SubscriptionPart
+        from juntagrico.entity.subtypes import SubscriptionType
+        from juntagrico.util.signals import set_old_state
+        from . import lifecycle
+        from .models import ContributionRound, ContributionOption, ContributionCondition, ContributionSelection
+
+        signals.post_init.connect(set_old_state, sender=ContributionSelection)
+        # must run before the old state is reset on post_save
+        signals.post_save.connect(lifecycle.selection_post_save, sender=ContributionSelection)
+        signals.post_save.connect(set_old_state, sender=ContributionSelection)
+        signals.post_delete.connect(lifecycle.selection_post_delete, sender=ContributionSelection)
+
+        signals.post_save.connect(lifecycle.round_changed, sender=ContributionRound)
+        signals.post_delete.connect(lifecycle.round_deleted, sender=ContributionRound)
+        for sender, handler in ((ContributionOption, lifecycle.option_changed),
+                                (ContributionCondition, lifecycle.condition_changed),
+                                (Subscription, lifecycle.subscription_changed),
+                                (SubscriptionPart, lifecycle.subscriptions_changed),
+                                (SubscriptionType, lifecycle.subscription_type_changed)):
+            if sender in lifecycle.RELEVANT_FIELDS:
+                signals.pre_save.connect(lifecycle.track_relevant_changes, sender=sender)
+            signals.post_save.connect(handler, sender=sender)
+            signals.post_delete.connect(handler, sender=sender)
@@ -0,0 +1,171 @@
+"""
+transfer of contribution selections into the bills of juntagrico_billing.
+only import this module if juntagrico_billing is installed.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from juntagrico_billing.models.bill import Bill, BillItem, BillItemType, BusinessYear
+
+from juntagrico_contribution.instrumentation import instrumented
+from juntagrico_contribution.models import BillTransferItem, BillTransferMark, ContributionSelection
+
+
+class BillTransferReport:
+    """
+    selections processed by a bill transfer, by outcome
+    """
+
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        # zero amount or bill item already up to date
+        self.skipped = []
+        # primary member has no bill in the business year
+        self.failed = []
+        # the BillItems that were created
+        self.items = []
+
+
+def transfer_selections(selections, business_year, bill_item_type):
+    """
+    create or update a bill item with the amount above the nominal price for each selection,
+    in a constant number of queries and a single transaction.
+    :param selections: queryset of valid ContributionSelections
+    :return: BillTransferReport
+    """
+    report = BillTransferReport()
+    selections = list(selections.with_nominal_price().select_related('subscription', 'selected_option'))
+    member_ids = {selection.subscription.primary_member_id for selection in selections}
+    # first bill and bill item wins, as in Bill.objects.filter(...).first()
+    bills = {}
+    for bill in Bill.objects.filter(business_year=business_year, member__in=member_ids).order_by('-pk'):
+        bills[bill.member_id] = bill
+    items = {}
+    for item in BillItem.objects.filter(bill__in=bills.values(), custom_item_type=bill_item_type).order_by('-pk'):
+        items[item.bill_id] = item
+
+    new_items = []
+    changed_items = []
+    for selection in selections:
+        bill = bills.get(selection.subscription.primary_member_id)
+        if bill is None:
+            report.failed.append(selection)
+            continue
+        amount = float(selection.price - (selection.nominal_price or 0))
+        # skip zero-amount bill items
+        if amount == 0:
+            report.skipped.append(selection)
+            continue
+        description = selection.selected_option.name if selection.selected_option else ''
+        item = items.get(bill.pk)
+        if item is None:
+            new_items.append(BillItem(bill=bill, custom_item_type=bill_item_type, amount=amount, description=description))
+            report.created.append(selection)
+        elif item.amount != amount or item.description != description:
+            item.amount = amount
+            item.description = description
+            changed_items.append(item)
+            report.updated.append(selection)
+        else:
+            report.skipped.append(selection)
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            BillItem.objects.bulk_create(new_items)
+        else:
+            # the ids of the created items are needed to undo the transfer
+            for item in new_items:
+                item.save()
+        BillItem.objects.bulk_update(changed_items, ['amount', 'description'])
+        update_bill_amounts({item.bill_id for item in new_items + changed_items})
+    report.items = new_items
+    return report
+
+
+def update_bill_amounts(bill_ids):
+    """
+    bulk operations on bill items bypass the signals of juntagrico_billing that keep the bill amount up to date
+    """
+    Bill.objects.filter(pk__in=bill_ids).update(amount=Coalesce(
+        Subquery(BillItem.objects.filter(bill=OuterRef('pk')).order_by().values('bill').annotate(
+            total=Sum('amount')
+        ).values('total')),
+        Value(0.0),
+    ))
+
+
+def get_mark(contribution_round, business_year_id, bill_item_type_id):
+    return BillTransferMark.objects.get_or_create(
+        round=contribution_round, business_year_id=business_year_id, bill_item_type_id=bill_item_type_id
+    )[0]
+
+
+@instrumented('billing.transfer_chunk')
+def transfer_chunk(job, chunk_size):
+    """
+    transfer the next chunk of selections of a BillTransferJob, in the order of their pk.
+    the caller saves the job in the same transaction.
+    """
+    mark = get_mark(job.round, job.business_year_id, job.bill_item_type_id)
+    selections = job.round.valid_selections()
+    if job.total is None:
+        job.start_date = timezone.now()
+        if job.full:
+            mark.failed = []
+    if not job.full:
+        selections = mark.changed_selections(selections)
+    if job.total is None:
+        job.total = selections.count()
+    chunk = list(selections.filter(pk__gt=job.checkpoint).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+    if chunk:
+        report = transfer_selections(
+            ContributionSelection.objects.filter(pk__in=chunk),
+            BusinessYear.objects.get(pk=job.business_year_id),
+            BillItemType.objects.filter(pk=job.bill_item_type_id).first(),
+        )
+        for outcome in ('created', 'updated', 'skipped', 'failed'):
+            setattr(job, outcome, getattr(job, outcome) + len(getattr(report, outcome)))
+        BillTransferItem.objects.bulk_create([BillTransferItem(
+            round=job.round, business_year_id=job.business_year_id, bill_item_type_id=job.bill_item_type_id,
+            bill_item_id=item.pk,
+        ) for item in report.items])
+        job.processed += len(chunk)
+        job.checkpoint = chunk[-1]
+        mark.failed = [pk for pk in mark.failed if pk not in chunk] + [selection.pk for selection in report.failed]
+    else:
+        # selections became invalid since the job started
+        job.processed = job.total
+    if job.processed >= job.total:
+        mark.synced_until = job.start_date
+    mark.save()
+
+
+@instrumented('billing.undo_chunk')
+def undo_chunk(job, chunk_size):
+    """
+    delete the next chunk of bill items created by the transfers of the round of the job,
+    with the business year and bill item type of the job.
+    the caller saves the job in the same transaction.
+    """
+    transfer_items = BillTransferItem.objects.filter(
+        round=job.round, business_year_id=job.business_year_id, bill_item_type_id=job.bill_item_type_id
+    )
+    if job.total is None:
+        job.total = transfer_items.count()
+        BillTransferMark.objects.filter(
+            round=job.round, business_year_id=job.business_year_id, bill_item_type_id=job.bill_item_type_id
+        ).delete()
+    chunk = list(transfer_items.filter(pk__gt=job.checkpoint).order_by('pk').values_list('pk', 'bill_item_id')[:chunk_size])
+    if not chunk:
+        job.processed = job.total
+        return
+    # bill items may have been deleted in the meantime
+    items = list(BillItem.objects.filter(pk__in=[item_id for _, item_id in chunk]).values_list('pk', 'bill_id'))
+    BillItem.objects.filter(pk__in=[pk for pk, _ in items]).delete()
+    update_bill_amounts({bill_id for _, bill_id in items})
+    BillTransferItem.objects.filter(pk__in=[pk for pk, _ in chunk]).delete()
+    job.deleted += len(items)
+    job.processed += len(chunk)
+    job.checkpoint = chunk[-1][0]
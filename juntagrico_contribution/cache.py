@@ -0,0 +1,63 @@
+"""
+namespaced keys in the django cache.
+each namespace has a version that is part of its keys, bumping it invalidates all entries of the namespace at once.
+"""
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+# prices of options, see pricing.get_round_price_table and pricing.get_composition_prices
+PRICES = 'prices'
+# the active round, see ContributionRound.get_active
+ROUNDS = 'rounds'
+# whether a member has contributions, see ContributionSelection.user_has_contributions
+CONTRIBUTORS = 'contributors'
+
+# hits and misses of this process by counter name, e.g. {'price_table': {'hits': 10, 'misses': 1}}
+_counters = {}
+
+
+def _version_key(namespace):
+    return f'jcr:{namespace}:version'
+
+
+def get_version(namespace):
+    # start from the current time, so that a version evicted from the cache is not reused
+    return cache.get_or_set(_version_key(namespace), time.time_ns, timeout=None)
+
+
+def _bump_version(namespace):
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        # not set yet or evicted
+        cache.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+def bump_version(namespace):
+    _bump_version(namespace)
+    # other processes may have cached the old state again before the transaction is committed
+    transaction.on_commit(lambda: _bump_version(namespace))
+
+
+def make_key(namespace, version, *parts):
+    return ':'.join(['jcr', namespace, str(version), *map(str, parts)])
+
+
+def count(name, hits=0, misses=0):
+    counter = _counters.setdefault(name, Counter())
+    counter['hits'] += hits
+    counter['misses'] += misses
+
+
+def get_counters():
+    """
+    :return: dict {counter name: {'hits': int, 'misses': int}} of the lookups in this process
+    """
+    return {name: {'hits': counter['hits'], 'misses': counter['misses']} for name, counter in _counters.items()}
+
+
+def reset_counters():
+    _counters.clear()
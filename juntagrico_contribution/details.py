@@ -0,0 +1,167 @@
+"""
+rows of the details table of a contribution round, loaded in a constant number of queries
+"""
+import datetime
+
+from django.db.models import DecimalField, F, FilteredRelation, OuterRef, Prefetch, Q, Subquery, Sum
+from django.utils.translation import gettext as _
+from juntagrico.entity.member import SubscriptionMembership
+from juntagrico.entity.subs import SubscriptionPart
+from juntagrico.entity.subtypes import SubscriptionType
+from impersonate.helpers import check_allow_impersonate, users_impersonable
+from impersonate.settings import settings as impersonate_settings
+
+from juntagrico_contribution.models import ContributionSelection
+
+
+def subscriptions_with_details(contribution_round, subscriptions=None):
+    """
+    :param subscriptions: queryset of subscriptions to show. defaults to all subscriptions of the round
+    :return: subscriptions with their selection in current_contribution (annotated with the nominal price)
+             and their memberships in jcr_memberships
+    """
+    if subscriptions is None:
+        subscriptions = contribution_round.subscriptions()
+    return subscriptions.select_related('primary_member__user').prefetch_related(
+        Prefetch(
+            'contributions',
+            queryset=ContributionSelection.objects.filter(round=contribution_round).with_nominal_price()
+            .select_related('selected_option'),
+            to_attr='current_contribution'
+        ),
+        Prefetch(
+            'subscriptionmembership_set',
+            queryset=SubscriptionMembership.objects.select_related('member__user').order_by('pk'),
+            to_attr='jcr_memberships'
+        ),
+    )
+
+
+def with_selection(subscriptions, contribution_round):
+    """
+    join the selection of each subscription in the round as jcr_selection, to filter and order by it in SQL
+    """
+    return subscriptions.annotate(jcr_selection=FilteredRelation(
+        'contributions', condition=Q(contributions__round=contribution_round)
+    ))
+
+
+def with_nominal_price(subscriptions, contribution_round):
+    """
+    annotate nominal_price: the total price of the subscription parts that are subject to the round
+    """
+    if contribution_round.has_snapshot:
+        parts = contribution_round.snapshot.filter(subscription=OuterRef('pk'))
+        price = 'nominal_price'
+    else:
+        parts = contribution_round.filter_parts(SubscriptionPart.objects.filter(subscription=OuterRef('pk')))
+        price = 'type__price'
+    return subscriptions.annotate(nominal_price=Subquery(
+        parts.order_by().values('subscription').annotate(total=Sum(price)).values('total'),
+        output_field=DecimalField(max_digits=9, decimal_places=2),
+    ))
+
+
+def search_members(subscriptions, search_value):
+    """
+    :return: subscriptions with a member whose name contains every word of search_value
+    """
+    for word in search_value.split():
+        q_name = Q(member__first_name__icontains=word) | Q(member__last_name__icontains=word)
+        subscriptions = subscriptions.filter(
+            Q(primary_member__first_name__icontains=word) | Q(primary_member__last_name__icontains=word)
+            | Q(pk__in=SubscriptionMembership.objects.filter(q_name).values('subscription'))
+        )
+    return subscriptions
+
+
+def filter_option(subscriptions, search_value):
+    """
+    filter subscriptions annotated by with_selection by the name of their selected option,
+    as displayed in the details table
+    """
+    q = Q(jcr_selection__selected_option__name__icontains=search_value)
+    search_value = search_value.lower()
+    if search_value in _('Anderer Betrag').lower():
+        q |= Q(jcr_selection__id__isnull=False, jcr_selection__selected_option=None)
+    if search_value in _('Kein Gebot').lower():
+        q |= Q(jcr_selection__id__isnull=True)
+    return subscriptions.filter(q)
+
+
+def filter_contact_me(subscriptions, search_value):
+    """
+    filter subscriptions annotated by with_selection by contact_me, as displayed in the details table
+    """
+    search_value = search_value.lower()
+    q = Q(pk__in=[])
+    if _('Ja').lower().startswith(search_value):
+        q |= Q(jcr_selection__contact_me=True)
+    if _('Nein').lower().startswith(search_value):
+        q |= Q(jcr_selection__contact_me=False)
+    return subscriptions.filter(q)
+
+
+def get_total_price(contribution_round, subscriptions):
+    """
+    :return: sum of the prices of the selections of the subscriptions in the round
+    """
+    return ContributionSelection.objects.filter(
+        round=contribution_round, subscription__in=subscriptions.order_by().values('pk')
+    ).aggregate(total=Sum('price')).get('total') or 0
+
+
+def set_content(subscriptions):
+    """
+    fill Subscription.content of each subscription in one query, such that Subscription.content_strings
+    does not query per subscription
+    """
+    subscriptions = list(subscriptions)
+    contents = {subscription.pk: [] for subscription in subscriptions}
+    # same as SubscriptionType.objects.with_active_or_future_parts() through Subscription.types.
+    # both conditions are in one filter, such that they filter the same join of the parts.
+    # otherwise the parts are joined twice and their sizes are summed repeatedly
+    today = datetime.date.today()
+    types = SubscriptionType.objects.filter(
+        Q(subscription_parts__deactivation_date=None) | Q(subscription_parts__deactivation_date__gte=today),
+        subscription_parts__subscription__in=contents,
+    )
+    for subscription_type in types.annotate(jcr_subscription=F('subscription_parts__subscription')).annotate_content():
+        contents[subscription_type.jcr_subscription].append(subscription_type)
+    for subscription in subscriptions:
+        subscription.content = contents[subscription.pk]
+
+
+def co_members(subscription):
+    """
+    same as Subscription.co_members, from the prefetched memberships
+    """
+    today = datetime.date.today()
+    members = {}
+    for membership in subscription.jcr_memberships:
+        member = membership.member
+        if subscription.inactive:
+            members[member.pk] = member
+        elif member.deactivation_date is not None and member.deactivation_date <= today:
+            continue
+        elif subscription.waiting or membership.join_date is not None and membership.join_date <= today and (
+                membership.leave_date is None or membership.leave_date > today):
+            members[member.pk] = member
+    members.pop(subscription.primary_member_id, None)
+    return list(members.values())
+
+
+def set_can_impersonate(request, members):
+    """
+    same as the impersonate_start template tag of juntagrico for each member, in one query.
+    sets jcr_can_impersonate on the members
+    """
+    members = list(members)
+    allowed = set()
+    if check_allow_impersonate(request):
+        allow_superusers = request.user.is_superuser and impersonate_settings.ALLOW_SUPERUSER
+        allowed = set(users_impersonable(request).filter(pk__in=[
+            member.user_id for member in members if allow_superusers or not member.user.is_superuser
+        ]).values_list('pk', flat=True))
+    for member in members:
+        member.jcr_can_impersonate = member.user_id in allowed
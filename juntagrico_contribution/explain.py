@@ -0,0 +1,96 @@
+"""
+capture the queries of a code path and explain their query plans, see the command explain_contribution_queries
+"""
+import re
+import time
+
+from django.db import DatabaseError, connection, transaction
+
+STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class CapturedQuery:
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        # duration of all executions in seconds
+        self.duration = 0.0
+        self.count = 0
+        self.plan = []
+        self.error = None
+
+
+def capture(func):
+    """
+    run func and record its queries, identical queries once
+    :return: list of CapturedQuery in the order of their first execution
+    """
+    queries = {}
+
+    def record(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not many and sql.lstrip().upper().startswith(STATEMENTS):
+                key = (sql, repr(params))
+                if key not in queries:
+                    queries[key] = CapturedQuery(sql, params)
+                queries[key].duration += time.perf_counter() - start
+                queries[key].count += 1
+
+    with connection.execute_wrapper(record):
+        func()
+    return list(queries.values())
+
+
+def explain(query, analyze=False):
+    """
+    store the query plan of the query in query.plan, or the error in query.error.
+    with analyze, the query is executed, so only call it in a transaction that is rolled back.
+    :raise ValueError: if the database does not support the options
+    """
+    options = {'analyze': True} if analyze else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    try:
+        # a failing statement aborts the transaction on postgresql
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {query.sql}', query.params)
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        query.error = str(e)
+        return
+    if connection.vendor == 'sqlite':
+        # id, parent, notused, detail
+        depths = {0: -1}
+        for row in rows:
+            depths[row[0]] = depths.get(row[1], -1) + 1
+            query.plan.append('  ' * depths[row[0]] + row[-1])
+    else:
+        query.plan = [' '.join(str(value) for value in row) for row in rows]
+
+
+def sequential_scans(query):
+    """
+    :return: names of the tables that the plan of the query reads in full
+    """
+    if connection.vendor == 'postgresql':
+        return [match.group(1) for line in query.plan for match in re.finditer(r'Seq Scan on (\w+)', line)]
+    if connection.vendor == 'sqlite':
+        # django aliases tables in subqueries, e.g. "juntagrico_subscriptionpart" U0
+        aliases = {alias: table for table, alias in re.findall(r'"(\w+)" ([A-Z]\d+)\b', query.sql)}
+        tables = []
+        for line in query.plan:
+            match = re.match(r'\s*SCAN (\w+)\s*$', line)
+            if match:
+                tables.append(aliases.get(match.group(1), match.group(1)))
+        return tables
+    return []
+
+
+def count_rows(table):
+    if table not in connection.introspection.table_names():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
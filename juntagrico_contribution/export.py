@@ -0,0 +1,95 @@
+"""
+export of the selections of a contribution round, one row per subscription of the round.
+rows are read in chunks, such that memory use does not grow with the size of the round.
+"""
+import csv
+from itertools import islice
+
+from django.db.models import F
+from django.template.defaultfilters import yesno
+from django.utils.translation import gettext as _
+from juntagrico.config import Config
+from xlsxwriter import Workbook
+
+from juntagrico_contribution.details import set_content, with_nominal_price, with_selection
+
+CHUNK_SIZE = 2000
+
+
+def get_header():
+    return [str(label) for label in (
+        _('Haupt-BezieherIn'), _('E-Mail'), Config.vocabulary('subscription'), _('Inhalt'), _('Auswahl'),
+        _('Beitrag'), _('Nominal'), _('Kann kontaktiert werden'), _('Zuletzt geändert am'),
+    )]
+
+
+def get_rows(contribution_round, chunk_size=CHUNK_SIZE):
+    """
+    :return: iterator over the rows of the export, in one query and one query per chunk for the content
+    """
+    subscriptions = with_nominal_price(
+        with_selection(contribution_round.subscriptions(), contribution_round), contribution_round
+    ).annotate(
+        jcr_option=F('jcr_selection__selected_option__name'),
+        jcr_has_selection=F('jcr_selection__id'),
+        jcr_price=F('jcr_selection__price'),
+        jcr_contact_me=F('jcr_selection__contact_me'),
+        jcr_modification_date=F('jcr_selection__modification_date'),
+    ).select_related('primary_member').order_by('pk')
+    subscriptions = subscriptions.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(subscriptions, chunk_size)):
+        set_content(chunk)
+        for subscription in chunk:
+            yield get_row(subscription)
+
+
+def get_row(subscription):
+    member = subscription.primary_member
+    if subscription.jcr_has_selection is None:
+        option, contact_me = _('Kein Gebot'), ''
+    else:
+        option = subscription.jcr_option or _('Anderer Betrag')
+        contact_me = yesno(subscription.jcr_contact_me, _('Ja,Nein'))
+    return [
+        member.get_name() if member else '',
+        member.email if member else '',
+        subscription.pk,
+        ', '.join(subscription.content_strings()),
+        option,
+        subscription.jcr_price,
+        subscription.nominal_price,
+        contact_me,
+        subscription.jcr_modification_date,
+    ]
+
+
+class Echo:
+    """
+    file-like object that returns what is written to it, to stream the output of csv.writer
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """
+    :return: iterator over the lines of the csv file
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def write_xlsx(header, rows, file):
+    """
+    write the rows into the excel workbook file.
+    in constant_memory mode xlsxwriter flushes each row to disk once the next row is written
+    """
+    workbook = Workbook(file, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, header, workbook.add_format({'bold': True}))
+    for number, row in enumerate(rows, 1):
+        worksheet.write_row(number, 0, row)
+    workbook.close()
@@ -2,12 +2,12 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Submit
 from django import forms
 from django.conf import settings
-from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext as _
 from django.utils.translation import gettext_lazy
 from juntagrico.config import Config
 
-from juntagrico_contribution.models import ContributionRound, ContributionSelection, ContributionOption
+from juntagrico_contribution.models import ContributionRound, ContributionSelection, BillTransferJob
+from juntagrico_contribution.pricing import PriceQuote
 
 
 class RoundForm(forms.Form):
@@ -39,13 +39,15 @@ class ContributionSelectionForm(forms.Form):
         self.contribution_round = contribution_round
         self.subscription = subscription
         self.contribution = self.contribution_round.selections.filter(subscription=self.subscription).first()
+        # shared by the choices, the template and the validation
+        self.quote = PriceQuote(contribution_round, subscription)
         super().__init__(*args, **kwargs)
         self.fields['selection'].choices = self.get_choices()
         if self.contribution_round.other_amount:
             initial = self.contribution.price if self.contribution else None
             self.fields['other_amount'] = forms.DecimalField(decimal_places=2, max_digits=9, required=False, initial=initial)
         if self.contribution:
-            self.fields['selection'].initial = self.contribution.selected_option.pk if self.contribution.selected_option else 'other'
+            self.fields['selection'].initial = self.contribution.selected_option_id or 'other'
             self.fields['contact_me'].initial = self.contribution.contact_me
 
     def get_choices(self):
@@ -55,17 +57,16 @@ class ContributionSelectionForm(forms.Form):
             yield 'other', _('Anderer Betrag')
 
     def visible_options(self):
-        for option in self.contribution_round.options.filter(visible=True):
-            if self.contribution is None or option.price_for(self.subscription) >= self.contribution.price:
+        for option in self.quote.options:
+            if option.visible and (self.contribution is None or self.quote.price(option) >= self.contribution.price):
                 yield option
 
     def get_selections(self):
+        """
+        :return: OptionQuotes of the visible options
+        """
         for option in self.visible_options():
-            yield ContributionSelection(
-                round=self.contribution_round,
-                subscription=self.subscription,
-                selected_option=option
-            )
+            yield self.quote[option]
 
     def clean(self):
         cleaned_data = super().clean()
@@ -75,8 +76,8 @@ class ContributionSelectionForm(forms.Form):
             if other_amount is None:
                 raise forms.ValidationError({'other_amount': _('Gib einen Betrag ein')})
             minimum_amount = 0
-            if self.contribution_round.minimum_amount:
-                minimum_amount = self.contribution_round.minimum_amount.price_for(self.subscription)
+            if self.contribution_round.minimum_amount_id:
+                minimum_amount = self.quote.price(self.contribution_round.minimum_amount_id)
             if self.contribution:
                 minimum_amount = max(minimum_amount, self.contribution.price)
             if other_amount < minimum_amount:
@@ -90,22 +91,21 @@ class ContributionSelectionForm(forms.Form):
             selected_option = None
             price = self.cleaned_data['other_amount']
         else:
-            selected_option = get_object_or_404(ContributionOption, pk=selection)
-            price = None
-        ContributionSelection.objects.update_or_create(
-            defaults=dict(
-                selected_option=selected_option,
-                price=price,
-                contact_me=self.cleaned_data['contact_me']
-            ),
+            selected_option = self.quote.get_option(int(selection))
+            price = self.quote.price(selected_option)
+        ContributionSelection.objects.upsert(ContributionSelection(
+            round=self.contribution_round,
             subscription=self.subscription,
-            round=self.contribution_round
-        )
+            selected_option=selected_option,
+            price=price,
+            contact_me=self.cleaned_data['contact_me'],
+        ))
 
 
 class BillTransferForm(forms.Form):
     business_year = forms.ModelChoiceField(queryset=None, required=True, empty_label=None, label=_('Geschäftsjahr'))
     bill_item_type = forms.ModelChoiceField(queryset=None, required=True, label=_('Rechnungselement-Typ'))
+    full = forms.BooleanField(required=False, label=_('Alle Beiträge erneut übertragen'))
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -115,44 +115,17 @@ class BillTransferForm(forms.Form):
             self.fields["business_year"].queryset = bill.BusinessYear.objects.all()
             self.fields["bill_item_type"].queryset = bill.BillItemType.objects.all()
 
-    def save(self, contribution_round):
-        failed = True
-        if self.enabled:
-            from juntagrico_billing.models.bill import Bill, BillItem
-            failed = []
-            for selection in contribution_round.valid_selections():
-                bill = Bill.objects.filter(
-                    member=selection.subscription.primary_member,
-                    business_year=self.cleaned_data['business_year'],
-                ).first()
-                if not bill:
-                    failed.append(selection.subscription.primary_member)
-                    continue
-                amount = selection.price - selection.get_nominal_price()
-
-                # skip zero-amount bill items
-                if amount == 0:
-                    continue
-
-                if selection.selected_option:
-                    description = selection.selected_option.name
-                else:
-                    description = ''
-
-                BillItem.objects.update_or_create(
-                    bill=bill,
-                    custom_item_type=self.cleaned_data['bill_item_type'],
-                    defaults={
-                        'amount': amount,
-                        'description': description,
-                    }
-                )
-        return failed
-
-    def delete(self, contribution_round):
-        if self.enabled:
-            from juntagrico_billing.models.bill import BillItem
-            BillItem.objects.filter(
-                custom_item_type=self.cleaned_data['bill_item_type'],
-                bill__business_year=self.cleaned_data['business_year'],
-            ).delete()
+    def create_job(self, contribution_round, action=BillTransferJob.ACTION_TRANSFER):
+        """
+        queue the transfer (or its undo) for the run_bill_transfer_jobs worker
+        :return: BillTransferJob or None if juntagrico_billing is not installed
+        """
+        if not self.enabled:
+            return None
+        return BillTransferJob.objects.create(
+            round=contribution_round,
+            action=action,
+            business_year_id=self.cleaned_data['business_year'].pk,
+            bill_item_type_id=self.cleaned_data['bill_item_type'].pk,
+            full=self.cleaned_data['full'],
+        )
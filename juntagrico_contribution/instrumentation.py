@@ -0,0 +1,147 @@
+"""
+opt-in metrics of the views, the expensive properties and the bill transfer, in this process.
+enabled with the setting JCR_INSTRUMENTATION = True.
+calls slower than JCR_SLOW_CALL_THRESHOLD seconds (default 1) are logged as warnings.
+"""
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from juntagrico_contribution.cache import get_counters
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds of the buckets of the duration histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+# metrics by name of the instrumented call
+_metrics = {}
+
+
+class CallMetrics:
+    def __init__(self):
+        # calls per bucket, the last one is +Inf
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+
+    def add(self, duration, queries):
+        self.buckets[bisect_left(BUCKETS, duration)] += 1
+        self.count += 1
+        self.duration += duration
+        self.queries += queries
+
+
+def is_enabled():
+    return getattr(settings, 'JCR_INSTRUMENTATION', False)
+
+
+@contextmanager
+def measure(name):
+    """
+    record the duration and the number of queries of the block under name
+    """
+    queries = 0
+
+    def count_query(execute, *args):
+        nonlocal queries
+        queries += 1
+        return execute(*args)
+
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_query):
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        with _lock:
+            _metrics.setdefault(name, CallMetrics()).add(duration, queries)
+        if duration >= getattr(settings, 'JCR_SLOW_CALL_THRESHOLD', 1):
+            logger.warning('slow call %s: %.3f s, %d queries', name, duration, queries)
+
+
+def instrumented(name):
+    """
+    decorator to measure the calls of a function, if the instrumentation is enabled
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            with measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_metrics():
+    """
+    :return: dict {name: CallMetrics} with a copy of the metrics of this process
+    """
+    with _lock:
+        return {name: copy_metrics(metrics) for name, metrics in _metrics.items()}
+
+
+def copy_metrics(metrics):
+    copy = CallMetrics()
+    copy.buckets = metrics.buckets[:]
+    copy.count, copy.duration, copy.queries = metrics.count, metrics.duration, metrics.queries
+    return copy
+
+
+def reset_metrics():
+    with _lock:
+        _metrics.clear()
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus():
+    """
+    :return: the metrics and the cache counters of this process in the prometheus text exposition format
+    """
+    lines = [
+        '# HELP jcr_call_duration_seconds Duration of the instrumented calls.',
+        '# TYPE jcr_call_duration_seconds histogram',
+    ]
+    metrics = sorted(get_metrics().items())
+    for name, call in metrics:
+        cumulative = 0
+        for bound, calls in zip((*BUCKETS, '+Inf'), call.buckets):
+            cumulative += calls
+            lines.append(f'jcr_call_duration_seconds_bucket{{name="{label(name)}",le="{bound}"}} {cumulative}')
+        lines.append(f'jcr_call_duration_seconds_sum{{name="{label(name)}"}} {call.duration}')
+        lines.append(f'jcr_call_duration_seconds_count{{name="{label(name)}"}} {call.count}')
+    lines += [
+        '# HELP jcr_call_queries_total Database queries of the instrumented calls.',
+        '# TYPE jcr_call_queries_total counter',
+    ]
+    lines += [f'jcr_call_queries_total{{name="{label(name)}"}} {call.queries}' for name, call in metrics]
+    counters = sorted(get_counters().items())
+    lines += [
+        '# HELP jcr_cache_lookups_total Lookups in the cache of prices, rounds and contributors.',
+        '# TYPE jcr_cache_lookups_total counter',
+    ]
+    for name, counter in counters:
+        lines.append(f'jcr_cache_lookups_total{{cache="{label(name)}",result="hit"}} {counter["hits"]}')
+        lines.append(f'jcr_cache_lookups_total{{cache="{label(name)}",result="miss"}} {counter["misses"]}')
+    lines += [
+        '# HELP jcr_cache_hit_ratio Share of the cache lookups that were hits.',
+        '# TYPE jcr_cache_hit_ratio gauge',
+    ]
+    for name, counter in counters:
+        lookups = counter['hits'] + counter['misses']
+        if lookups:
+            lines.append(f'jcr_cache_hit_ratio{{cache="{label(name)}"}} {counter["hits"] / lookups}')
+    return '\n'.join(lines) + '\n'
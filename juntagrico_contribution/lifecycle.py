@@ -0,0 +1,112 @@
+from django.db.models import signals
+from juntagrico.entity.subs import Subscription, SubscriptionPart
+from juntagrico.entity.subtypes import SubscriptionType
+
+from juntagrico_contribution.cache import CONTRIBUTORS, PRICES, ROUNDS, bump_version
+from juntagrico_contribution.models import ContributionRound, ContributionRoundStats, BillTransferMark, \
+    ContributionSelection, SELECTION_FIELDS
+
+# fields that decide whether subscriptions are subject to a round, their nominal and option prices and their bill.
+# see ContributionRound.filter_parts and ContributionRound.subscriptions
+RELEVANT_FIELDS = {
+    Subscription: ('creation_date', 'cancellation_date', 'deactivation_date', 'primary_member_id'),
+    SubscriptionPart: ('subscription_id', 'type_id', 'creation_date', 'cancellation_date', 'deactivation_date'),
+    SubscriptionType: ('price', 'trial_days'),
+}
+
+
+def selection_values(values):
+    return {field: values[field] for field in SELECTION_FIELDS}
+
+
+def selection_post_save(sender, instance, created, **kwargs):
+    old = None if created else selection_values(instance._old)
+    ContributionRoundStats.update_selection(old, selection_values(instance.__dict__))
+    if old is None or old['subscription_id'] != instance.subscription_id:
+        ContributionSelection.invalidate_contributor({instance.subscription_id, old and old['subscription_id']})
+
+
+def selection_post_delete(sender, instance, **kwargs):
+    ContributionRoundStats.update_selection(selection_values(instance.__dict__), None)
+    ContributionSelection.invalidate_contributor([instance.subscription_id])
+
+
+def round_changed(sender, instance, **kwargs):
+    # closed rounds are frozen in a snapshot
+    if instance.status == ContributionRound.STATUS_CLOSED:
+        if instance.has_snapshot:
+            instance.update_snapshot_prices()
+        else:
+            instance.create_snapshot()
+            # the nominal prices and the eligibility of selections may differ from the live data
+            BillTransferMark.objects.filter(round=instance).delete()
+    elif instance.has_snapshot:
+        instance.delete_snapshot()
+        BillTransferMark.objects.filter(round=instance).delete()
+    ContributionRoundStats.objects.filter(round=instance).mark_stale()
+    bump_version(ROUNDS)
+
+
+def round_deleted(sender, instance, **kwargs):
+    bump_version(ROUNDS)
+
+
+def option_changed(sender, instance, **kwargs):
+    bump_version(PRICES)
+    update_snapshot_prices(instance)
+    # bill items are described by the option name
+    BillTransferMark.objects.filter(round_id=instance.round_id).delete()
+    ContributionRoundStats.objects.filter(round_id=instance.round_id).mark_stale()
+
+
+def condition_changed(sender, instance, **kwargs):
+    bump_version(PRICES)
+    update_snapshot_prices(instance.option)
+    ContributionRoundStats.objects.filter(round__options=instance.option_id).mark_stale()
+
+
+def update_snapshot_prices(option):
+    for contribution_round in option.is_default_for.exclude(snapshot_created=None):
+        contribution_round.update_snapshot_prices()
+
+
+def track_relevant_changes(sender, instance, **kwargs):
+    """
+    on pre_save, as juntagrico resets the old state of its entities on post_save before the handlers below run
+    """
+    old = instance._old or {}
+    instance._jcr_relevant_change = instance._state.adding or any(
+        field not in old or old[field] != instance.__dict__.get(field) for field in RELEVANT_FIELDS[sender]
+    )
+
+
+def is_relevant_change(instance, signal):
+    """
+    :return: True if the instance was deleted, created or saved with changes to its RELEVANT_FIELDS
+    """
+    if signal is signals.post_delete:
+        return True
+    return instance.__dict__.pop('_jcr_relevant_change', True)
+
+
+def subscriptions_changed(sender, instance, signal, **kwargs):
+    """
+    eligibility and prices of subscriptions may have changed. snapshots of closed rounds are not affected.
+    :return: True if they changed
+    """
+    if not is_relevant_change(instance, signal):
+        return False
+    ContributionRoundStats.objects.filter(round__snapshot_created=None).mark_stale()
+    BillTransferMark.objects.filter(round__snapshot_created=None).delete()
+    return True
+
+
+def subscription_type_changed(sender, **kwargs):
+    if subscriptions_changed(sender, **kwargs):
+        bump_version(PRICES)
+
+
+def subscription_changed(sender, **kwargs):
+    if subscriptions_changed(sender, **kwargs):
+        # the primary member may have changed
+        bump_version(CONTRIBUTORS)
@@ -0,0 +1,144 @@
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from juntagrico_contribution.explain import capture, count_rows, explain, sequential_scans
+from juntagrico_contribution.forms import ContributionSelectionForm
+from juntagrico_contribution.models import BillTransferJob, BillTransferMark, ContributionRound
+from juntagrico_contribution.statistics import RoundStatistics
+from juntagrico_contribution.views import admin
+
+PATHS = ('summary', 'details', 'select', 'bill_transfer')
+# default of run_bill_transfer_jobs
+CHUNK_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = ("Print the query plans of the queries of the summary, details, select and bill transfer of a contribution "
+            "round, with their duration, and flag sequential scans of large tables. Nothing is stored.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('round', type=int, help='Id of the contribution round.')
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Execute the queries to show the actual plans, e.g. EXPLAIN ANALYZE on PostgreSQL.',
+        )
+        parser.add_argument('--paths', nargs='+', choices=PATHS, default=PATHS, help='Paths to explain.')
+        parser.add_argument(
+            '--subscription', type=int,
+            help='Id of the subscription that selects in the select path. Defaults to the first of the round.',
+        )
+        parser.add_argument(
+            '--large-table', type=int, default=1000,
+            help='Minimum number of rows of a table for its sequential scans to be flagged.',
+        )
+
+    def handle(self, *args, **options):
+        contribution_round = ContributionRound.objects.filter(pk=options['round']).first()
+        if contribution_round is None:
+            raise CommandError(f'contribution round {options["round"]} does not exist')
+        try:
+            connection.ops.explain_query_prefix(**({'analyze': True} if options['analyze'] else {}))
+        except ValueError:
+            raise CommandError(f'{connection.vendor} does not support --analyze') from None
+        subscriptions = contribution_round.subscriptions()
+        if options['subscription']:
+            subscriptions = subscriptions.filter(pk=options['subscription'])
+        subscription = subscriptions.order_by('pk').first()
+
+        self.row_counts = {}
+        flagged = 0
+        # every lookup misses, so that the queries behind the cached prices show up.
+        # the writes of the paths and of --analyze are rolled back.
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}), \
+                transaction.atomic():
+            for path in options['paths']:
+                if path == 'select' and subscription is None:
+                    self.stdout.write(f'== {path}: the round has no subscription ==')
+                    continue
+                run = getattr(self, path)(contribution_round, subscription)
+                queries = capture(run)
+                self.stdout.write(f'== {path}: {len(queries)} queries, '
+                                  f'{sum(query.duration for query in queries) * 1000:.2f} ms ==')
+                for number, query in enumerate(queries, 1):
+                    explain(query, options['analyze'])
+                    flagged += self.write_query(number, query, options['large_table'])
+            transaction.set_rollback(True)
+        self.stdout.write(f'{flagged} sequential scans of tables with at least {options["large_table"]} rows')
+
+    def write_query(self, number, query, large_table):
+        """
+        :return: number of flagged sequential scans
+        """
+        count = f' ({query.count}x)' if query.count > 1 else ''
+        self.stdout.write(f'[{number}] {query.duration * 1000:.2f} ms{count}')
+        self.stdout.write(query.sql)
+        if query.params:
+            self.stdout.write(f'params: {list(query.params)}')
+        if query.error:
+            self.stdout.write(f'  error: {query.error}')
+        for line in query.plan:
+            self.stdout.write(f'  {line}')
+        flagged = 0
+        for table in sequential_scans(query):
+            if table not in self.row_counts:
+                self.row_counts[table] = count_rows(table)
+            rows = self.row_counts[table]
+            if rows is not None and rows >= large_table:
+                self.stdout.write(f'  ! sequential scan of {table} ({rows} rows)')
+                flagged += 1
+        self.stdout.write('')
+        return flagged
+
+    def summary(self, contribution_round, subscription):
+        def run():
+            RoundStatistics.compute(contribution_round)
+            contribution_round.bill_transfer_jobs.order_by('-pk').first()
+        return run
+
+    def details(self, contribution_round, subscription):
+        request = RequestFactory().get(reverse('jcr:admin-details-data'), {
+            'round': contribution_round.pk, 'draw': 1, 'start': 0, 'length': 25,
+        })
+        # has all permissions without a query
+        request.user = User(is_active=True, is_staff=True, is_superuser=True)
+
+        def run():
+            admin.details_data(request)
+        return run
+
+    def select(self, contribution_round, subscription):
+        def run():
+            form = ContributionSelectionForm(contribution_round, subscription, {
+                'selection': contribution_round.minimum_amount_id or contribution_round.options.first().pk,
+            })
+            list(form.get_selections())
+            if form.is_valid():
+                form.save()
+        return run
+
+    def bill_transfer(self, contribution_round, subscription):
+        if apps.is_installed('juntagrico_billing'):
+            from juntagrico_billing.models.bill import BusinessYear
+            business_year = BusinessYear.objects.order_by('-start_date').first()
+            if business_year is not None:
+                # as processed by the run_bill_transfer_jobs worker
+                job = BillTransferJob.objects.create(
+                    round=contribution_round, business_year_id=business_year.pk, bill_item_type_id=None, full=True
+                )
+
+                def run_job():
+                    while not job.process_chunk(CHUNK_SIZE):
+                        pass
+                return run_job
+
+        def run():
+            # the selections read by a transfer
+            selections = BillTransferMark(round=contribution_round).changed_selections(
+                contribution_round.valid_selections()
+            )
+            list(selections.with_nominal_price().select_related('subscription', 'selected_option'))
+        return run
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from juntagrico_contribution.models import ContributionRound, ContributionRoundStats
+from juntagrico_contribution.statistics import RoundStatistics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored statistics of contribution rounds from scratch and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'round', nargs='*', type=int,
+            help='Ids of the contribution rounds to rebuild. Defaults to all rounds.',
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drift without storing the rebuilt statistics.',
+        )
+
+    def handle(self, *args, **options):
+        rounds = ContributionRound.objects.all()
+        if options['round']:
+            rounds = rounds.filter(id__in=options['round'])
+        for contribution_round in rounds:
+            statistics = RoundStatistics.compute(contribution_round)
+            stored = ContributionRoundStats.objects.filter(round=contribution_round).first()
+            if stored is None:
+                self.stdout.write(f'{contribution_round}: no stored statistics')
+            else:
+                stored.round = contribution_round
+                if stored.stale:
+                    self.stdout.write(f'{contribution_round}: stored statistics are stale')
+                differences = stored.to_statistics().differences(statistics)
+                for name, stored_value, value in differences:
+                    self.stdout.write(f'{contribution_round}: {name} drifted: stored {stored_value}, actual {value}')
+                if not differences:
+                    self.stdout.write(f'{contribution_round}: no drift')
+            if not options['check']:
+                ContributionRoundStats.store(statistics)
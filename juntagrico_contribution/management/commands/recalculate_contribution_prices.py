@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from juntagrico_contribution.models import ContributionRound
+
+
+class Command(BaseCommand):
+    help = "Recalculate the stored prices of the selections with an option after options or conditions changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'round', nargs='*', type=int,
+            help='Ids of the contribution rounds to recalculate. Defaults to all rounds.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the price changes without storing them.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of selections loaded and updated per query.',
+        )
+
+    def handle(self, *args, **options):
+        rounds = ContributionRound.objects.all()
+        if options['round']:
+            rounds = rounds.filter(id__in=options['round'])
+        for contribution_round in rounds:
+            changes = contribution_round.recalculate_prices(options['dry_run'], options['batch_size'])
+            if options['verbosity'] >= 2:
+                for selection, old_price, new_price in changes:
+                    self.stdout.write(
+                        f'{contribution_round}: selection {selection.pk}: {old_price:.2f} -> {new_price:.2f}'
+                    )
+            net = sum(new_price - old_price for _, old_price, new_price in changes)
+            verb = 'would change' if options['dry_run'] else 'changed'
+            self.stdout.write(f'{contribution_round}: {len(changes)} prices {verb}, net {net:+.2f}')
@@ -0,0 +1,50 @@
+import time
+import traceback
+
+from django.core.management.base import BaseCommand
+
+from juntagrico_contribution.models import BillTransferJob
+
+
+class Command(BaseCommand):
+    help = "Process queued bill transfers of contribution rounds in chunks. " \
+           "Interrupted transfers are resumed from their last checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit as soon as no queued transfers are left instead of waiting for new ones.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Number of selections to transfer per transaction.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait between checks for new transfers.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # running jobs were interrupted and continue from their checkpoint
+            job = BillTransferJob.objects.pending().order_by('pk').first()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+            self.run(job, options['chunk_size'])
+
+    def run(self, job, chunk_size):
+        self.stdout.write(f'{job.round}: {job.get_action_display()} from checkpoint {job.checkpoint}')
+        try:
+            while not job.process_chunk(chunk_size):
+                self.stdout.write(f'{job.round}: {job.processed}/{job.total}')
+        except Exception:
+            self.stderr.write(traceback.format_exc())
+            job.fail(traceback.format_exc(limit=1))
+            return
+        self.stdout.write(
+            f'{job.round}: done, {job.created} created, {job.updated} updated, {job.deleted} deleted, '
+            f'{job.skipped} unchanged, {job.failed} failed'
+        )
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:53
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('juntagrico_contribution', '0003_contributionround_default_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContributionRoundStats',
+            fields=[
+                ('round', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='juntagrico_contribution.contributionround')),
+                ('subscription_count', models.IntegerField(default=0)),
+                ('total_nominal', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=11)),
+                ('total_unselected', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=13)),
+                ('other_count', models.IntegerField(default=0)),
+                ('other_total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=11)),
+                ('other_nominal', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=11)),
+                ('stale', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Beitragsrunden-Statistik',
+                'verbose_name_plural': 'Beitragsrunden-Statistiken',
+            },
+        ),
+        migrations.CreateModel(
+            name='ContributionOptionStats',
+            fields=[
+                ('option', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='juntagrico_contribution.contributionoption')),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=11)),
+                ('round_stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='options', to='juntagrico_contribution.contributionroundstats')),
+            ],
+            options={
+                'verbose_name': 'Beitrags-Option-Statistik',
+                'verbose_name_plural': 'Beitrags-Option-Statistiken',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('juntagrico', '0041_1_7'),
+        ('juntagrico_contribution', '0004_contributionroundstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contributionround',
+            name='snapshot_created',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Stand eingefroren am'),
+        ),
+        migrations.CreateModel(
+            name='ContributionSnapshotPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nominal_price', models.DecimalField(decimal_places=2, max_digits=9, verbose_name='Nominalbetrag')),
+                ('default_price', models.DecimalField(decimal_places=6, max_digits=15, verbose_name='Standardbetrag')),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contribution_snapshots', to='juntagrico.subscriptionpart')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='juntagrico_contribution.contributionround')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contribution_snapshots', to='juntagrico.subscription')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contribution_snapshots', to='juntagrico.subscriptiontype')),
+            ],
+            options={
+                'verbose_name': 'Eingefrorener Bestandteil',
+                'verbose_name_plural': 'Eingefrorene Bestandteile',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='contributionsnapshotpart',
+            constraint=models.UniqueConstraint(fields=('round', 'part'), name='unique_round_part'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('juntagrico_contribution', '0005_contributionsnapshotpart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillTransferJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('T', 'Übertragen'), ('U', 'Rückgängig machen')], default='T', max_length=1, verbose_name='Aktion')),
+                ('status', models.CharField(choices=[('P', 'Wartend'), ('R', 'Läuft'), ('D', 'Abgeschlossen'), ('F', 'Fehlgeschlagen')], default='P', max_length=1, verbose_name='Status')),
+                ('business_year_id', models.PositiveIntegerField()),
+                ('bill_item_type_id', models.PositiveIntegerField(null=True)),
+                ('total', models.PositiveIntegerField(null=True)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('checkpoint', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+                ('heartbeat', models.DateTimeField(null=True)),
+                ('finish_date', models.DateTimeField(null=True)),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bill_transfer_jobs', to='juntagrico_contribution.contributionround')),
+            ],
+            options={
+                'verbose_name': 'Rechnungs-Übertragung',
+                'verbose_name_plural': 'Rechnungs-Übertragungen',
+            },
+        ),
+    ]
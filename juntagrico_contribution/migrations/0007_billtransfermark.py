@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('juntagrico_contribution', '0006_billtransferjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billtransferjob',
+            name='full',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='billtransferjob',
+            name='start_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='contributionselection',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='BillTransferMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_year_id', models.PositiveIntegerField()),
+                ('bill_item_type_id', models.PositiveIntegerField(null=True)),
+                ('synced_until', models.DateTimeField(null=True)),
+                ('failed', models.JSONField(default=list)),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bill_transfer_marks', to='juntagrico_contribution.contributionround')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='billtransfermark',
+            constraint=models.UniqueConstraint(fields=('round', 'business_year_id', 'bill_item_type_id'), name='unique_bill_transfer_mark'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('juntagrico_contribution', '0007_billtransfermark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contributionselection',
+            index=models.Index(fields=['round', 'selected_option', 'price'], name='jcr_selection_round_option'),
+        ),
+        migrations.AddIndex(
+            model_name='contributionselection',
+            index=models.Index(fields=['round', 'modification_date'], name='jcr_selection_round_date'),
+        ),
+        migrations.AddIndex(
+            model_name='contributionselection',
+            index=models.Index(fields=['modification_date'], name='jcr_selection_date'),
+        ),
+        migrations.AddIndex(
+            model_name='contributionselection',
+            index=models.Index(fields=['round', 'modified_at'], name='jcr_selection_round_modified'),
+        ),
+    ]
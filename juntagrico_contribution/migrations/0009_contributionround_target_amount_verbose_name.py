@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('juntagrico_contribution', '0008_contributionselection_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contributionround',
+            name='target_amount',
+            field=models.DecimalField(decimal_places=2, max_digits=9, verbose_name='Ziel-Betrag'),
+        ),
+    ]
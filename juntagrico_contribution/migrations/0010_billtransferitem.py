@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('juntagrico_contribution', '0009_contributionround_target_amount_verbose_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillTransferItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_year_id', models.PositiveIntegerField()),
+                ('bill_item_type_id', models.PositiveIntegerField(null=True)),
+                ('bill_item_id', models.PositiveIntegerField(unique=True)),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bill_transfer_items', to='juntagrico_contribution.contributionround')),
+            ],
+        ),
+    ]
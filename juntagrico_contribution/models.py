@@ -1,14 +1,117 @@
+import copy
+import datetime
+from collections import defaultdict
 from decimal import Decimal
 from functools import cached_property
-from math import ceil
 
-from django.db import models
-from django.db.models import Avg, Sum
+from django.core.cache import cache
+from django.db import connections, models, transaction
+from django.utils import timezone
+from django.db.models import Avg, Count, Exists, Sum, OuterRef, Subquery, F, Value, DecimalField, Q, Case, When
+from django.db.models.functions import Ceil, Coalesce, Round
+from django.db.models.lookups import IsNull
 from django.utils.translation import gettext_lazy as _
 from juntagrico.entity import SimpleStateModelQuerySet
 from juntagrico.entity.subs import Subscription, SubscriptionPart
 from juntagrico.entity.subtypes import SubscriptionType
 
+from juntagrico_contribution.cache import CONTRIBUTORS, ROUNDS, count, get_version, make_key
+from juntagrico_contribution.instrumentation import instrumented
+from juntagrico_contribution.pricing import PriceChange, PriceMatrix, get_composition, get_composition_prices, \
+    get_parts_with_prices, get_price_table, get_round_price_table
+from juntagrico_contribution.statistics import RoundStatistics
+
+# unrounded prices have up to 6 decimal places: 2 of the type price and 4 of the multiplier
+PRICE_FIELD = DecimalField(max_digits=15, decimal_places=6)
+
+# values of a selection that the stored statistics depend on, see ContributionRoundStats.update_selection
+SELECTION_FIELDS = ('round_id', 'subscription_id', 'selected_option_id', 'price')
+
+# version of the ROUNDS namespace and the active round, as loaded by this process
+_active_round = (None, None)
+
+
+def q_subject_by_date(cancellation_cutoff, creation_cutoff, prefix=''):
+    """
+    same as ContributionRound._filter_by_date, but with the cutoff dates given as expressions
+    :param prefix: path to the subscription or subscription part to filter, e.g. 'subscription__'
+    """
+    return (
+        Q(**{f'{prefix}deactivation_date': None})
+        & (Q(IsNull(cancellation_cutoff, True)) | Q(**{f'{prefix}cancellation_date': None})
+           | Q(**{f'{prefix}cancellation_date__gt': cancellation_cutoff}))
+        & (Q(IsNull(creation_cutoff, True)) | Q(**{f'{prefix}creation_date__gte': creation_cutoff}))
+    )
+
+
+def q_subject_to_round(cancellation_cutoff, creation_cutoff):
+    """
+    same as ContributionRound.filter_parts, but with the cutoff dates given as expressions,
+    e.g. OuterRef('round__cancellation_cutoff'), to filter parts for several rounds in one query
+    :return: Q filtering subscription parts that are subject to the round
+    """
+    return Q(type__trial_days=0) & q_subject_by_date(cancellation_cutoff, creation_cutoff)
+
+
+class ContributionRoundQuerySet(models.QuerySet):
+    def with_metrics(self):
+        """
+        annotate the number of subscriptions (subscription_count), the number of valid selections (submitted),
+        their total price (total_selected) and the total nominal price (total_nominal) of each round,
+        with one subquery per number. rounds with a snapshot are read from the snapshot.
+        the annotations take the place of the cached properties of the same name,
+        such that e.g. effective_target_amount does not query the database anymore.
+        """
+        cancellation_cutoff, creation_cutoff = OuterRef('cancellation_cutoff'), OuterRef('creation_cutoff')
+        # same as subscription_parts and subscriptions for several rounds
+        live_parts = SubscriptionPart.objects.filter(q_subject_to_round(cancellation_cutoff, creation_cutoff))
+        live_subscription_parts = live_parts.filter(
+            q_subject_by_date(cancellation_cutoff, creation_cutoff, 'subscription__')
+        )
+        snapshot_parts = ContributionSnapshotPart.objects.filter(round=OuterRef('pk'))
+        # same as valid_selections for selections of several rounds
+        selection_parts = SubscriptionPart.objects.filter(
+            q_subject_to_round(OuterRef('round__cancellation_cutoff'), OuterRef('round__creation_cutoff')),
+            subscription=OuterRef('subscription'),
+        )
+        selections = ContributionSelection.objects.filter(round=OuterRef('pk')).filter(
+            Q(
+                q_subject_by_date(F('round__cancellation_cutoff'), F('round__creation_cutoff'), 'subscription__'),
+                Exists(selection_parts), round__snapshot_created=None,
+            ) | Q(
+                Exists(ContributionSnapshotPart.objects.filter(
+                    round=OuterRef('round'), subscription=OuterRef('subscription')
+                )), round__snapshot_created__isnull=False,
+            )
+        )
+
+        def aggregate(queryset, expression, output_field):
+            # group by a constant to aggregate over the whole subquery
+            return Subquery(
+                queryset.order_by().annotate(group=Value(1)).values('group').annotate(value=expression).values('value'),
+                output_field=output_field,
+            )
+
+        def by_snapshot(live, snapshot, default):
+            return Coalesce(Case(When(snapshot_created=None, then=live), default=snapshot), default)
+
+        count_field = models.IntegerField()
+        price_field = DecimalField(max_digits=11, decimal_places=2)
+        return self.annotate(
+            subscription_count=by_snapshot(
+                aggregate(live_subscription_parts, Count('subscription', distinct=True), count_field),
+                aggregate(snapshot_parts, Count('subscription', distinct=True), count_field),
+                0,
+            ),
+            submitted=Coalesce(aggregate(selections, Count('pk'), count_field), 0),
+            total_selected=Coalesce(aggregate(selections, Sum('price'), price_field), Decimal(0), output_field=price_field),
+            total_nominal=by_snapshot(
+                aggregate(live_parts, Sum('type__price'), price_field),
+                aggregate(snapshot_parts, Sum('nominal_price'), price_field),
+                Decimal(0),
+            ),
+        )
+
 
 class ContributionRound(models.Model):
     STATUS_DRAFT = 'D'
@@ -51,11 +154,15 @@ class ContributionRound(models.Model):
         _('Kündigungsfrist'), blank=True, null=True,
         help_text=_('Wer erst nach diesem Datum gekündigt hat, nimmt noch an der Beitragsrunde teil.')
     )
+    snapshot_created = models.DateTimeField(_('Stand eingefroren am'), null=True, blank=True, editable=False)
+
+    objects = ContributionRoundQuerySet.as_manager()
 
     def valid_selections(self):
         return self.selections.filter(subscription__in=self.subscriptions())
 
     @cached_property
+    @instrumented('ContributionRound.submitted')
     def submitted(self):
         return self.valid_selections().count()
 
@@ -64,15 +171,15 @@ class ContributionRound(models.Model):
         return self.valid_selections().filter(selected_option=None)
     
     @cached_property
+    @instrumented('ContributionRound.other_amounts_average_increase')
     def other_amounts_average_increase(self):
-        if not self.other_amounts.exists():
+        totals = self.other_amounts.with_nominal_price().aggregate(total=Sum('price'), nominal=Sum('nominal_price'))
+        if not totals['nominal']:
             return Decimal(0.0)
-        
-        amount = self.other_amounts.aggregate(total=Sum('price')).get('total')
-        nominal_amount = sum(sel.get_nominal_price() for sel in self.other_amounts)
-        return ((Decimal(amount) / Decimal(nominal_amount)) - Decimal(1.0)) * Decimal(100.0)
-        
+        return ((Decimal(totals['total']) / Decimal(totals['nominal'])) - Decimal(1.0)) * Decimal(100.0)
+
     @cached_property
+    @instrumented('ContributionRound.total_selected')
     def total_selected(self):
         return self.valid_selections().aggregate(
             total=Sum('price')
@@ -80,18 +187,41 @@ class ContributionRound(models.Model):
 
     @cached_property
     def total_unselected(self):
+        return self.get_total_unselected()
+
+    @instrumented('ContributionRound.get_total_unselected')
+    def get_total_unselected(self):
         """
-        total amount of all subscription parts without a contribution selection.
+        total amount of all subscriptions without a contribution selection.
         the amount is calculated using the default_amount option if set, otherwise the nominal price.
-        the rounding of the option is not applied here, as this would be too complex for the database query.
         """
-        prices_by_type = self.default_amount.price_by_type if self.default_amount else {}
-        parts = self.subscription_parts().exclude(subscription__contributions__round=self)
-        
-        return sum([prices_by_type.get(part.type, part.type.price) for part in parts])
-    
+        if self.has_snapshot:
+            parts = self.snapshot.filter(subscription=OuterRef('pk'))
+            price = F('default_price')
+        else:
+            parts = self.filter_parts(SubscriptionPart.objects.filter(subscription=OuterRef('pk')))
+            if self.default_amount:
+                price = self.default_amount.get_part_price_expression()
+            else:
+                price = F('type__price')
+        amount = Subquery(
+            parts.order_by().values('subscription').annotate(total=Sum(price)).values('total'),
+            output_field=PRICE_FIELD,
+        )
+        if self.default_amount:
+            amount = self.default_amount.get_rounding_expression(amount)
+        return self.subscriptions().exclude(contributions__round=self).annotate(
+            default_price=amount
+        ).aggregate(total=Sum('default_price')).get('total') or Decimal(0)
+
     @cached_property
     def total_nominal(self):
+        return self.get_total_nominal()
+
+    @instrumented('ContributionRound.get_total_nominal')
+    def get_total_nominal(self):
+        if self.has_snapshot:
+            return self.snapshot.aggregate(total=Sum('nominal_price')).get('total') or Decimal(0)
         return self.subscription_parts().aggregate(total=Sum('type__price')).get('total') or Decimal(0)
 
     @property
@@ -113,6 +243,8 @@ class ContributionRound(models.Model):
         return parts
 
     def filter_parts(self, parts: SimpleStateModelQuerySet):
+        if self.has_snapshot:
+            return parts.filter(contribution_snapshots__round=self)
         parts = self._filter_by_date(parts).filter(type__trial_days=0)
         return parts
 
@@ -126,11 +258,166 @@ class ContributionRound(models.Model):
         """
         :return: all subscriptions that are subject to this round
         """
+        if self.has_snapshot:
+            return Subscription.objects.filter(pk__in=self.snapshot.values('subscription'))
         return self._filter_by_date(Subscription.objects).filter(parts__in=self.subscription_parts()).distinct()
 
+    def _is_subject(self, entity):
+        """
+        same as _filter_by_date for a single subscription or subscription part
+        """
+        return (
+            entity.deactivation_date is None
+            and (not self.cancellation_cutoff or entity.cancellation_date is None
+                 or entity.cancellation_date > self.cancellation_cutoff)
+            and (not self.creation_cutoff or (entity.creation_date is not None
+                                              and entity.creation_date >= self.creation_cutoff))
+        )
+
+    def is_eligible(self, subscription):
+        """
+        same as subscription in self.subscriptions(), but only looks at this subscription.
+        checks prefetched parts in python, otherwise queries the parts of the subscription.
+        """
+        if self.has_snapshot:
+            return self.snapshot.filter(subscription=subscription).exists()
+        if not self._is_subject(subscription):
+            return False
+        parts = getattr(subscription, '_prefetched_objects_cache', {}).get('parts')
+        if parts is not None:
+            return any(self._is_subject(part) and part.type.trial_days == 0 for part in parts)
+        return self.filter_parts(subscription.parts).exists()
+
+    @property
+    def has_snapshot(self):
+        """
+        closed rounds keep a snapshot of their subscription parts. queries of this round then read the snapshot.
+        """
+        return self.snapshot_created is not None
+
+    def create_snapshot(self):
+        """
+        freeze the subscription parts that are subject to this round together with their nominal and default prices
+        """
+        parts = self.subscription_parts().filter(subscription__in=self.subscriptions())
+        if self.default_amount:
+            default_price = self.default_amount.get_part_price_expression()
+        else:
+            default_price = F('type__price')
+        with transaction.atomic():
+            ContributionSnapshotPart.objects.bulk_create([
+                ContributionSnapshotPart(
+                    round=self, part_id=part_id, subscription_id=subscription_id, type_id=type_id,
+                    nominal_price=nominal_price, default_price=part_default_price,
+                ) for part_id, subscription_id, type_id, nominal_price, part_default_price in parts.annotate(
+                    default_price=default_price
+                ).values_list('id', 'subscription', 'type', 'type__price', 'default_price')
+            ])
+            self.snapshot_created = timezone.now()
+            ContributionRound.objects.filter(pk=self.pk).update(snapshot_created=self.snapshot_created)
+
+    def update_snapshot_prices(self):
+        """
+        reprice the snapshot after the default option of this round has changed
+        """
+        if self.default_amount is None:
+            self.snapshot.update(default_price=F('nominal_price'))
+            return
+        # not the cached price_by_type_id, as the option may just have been changed.
+        # priced from the nominal prices of the snapshot, which may differ from the current prices of the types
+        type_prices = dict(self.snapshot.order_by().values_list('type', 'nominal_price').distinct())
+        for type_id, price in get_price_table([self.default_amount], type_prices)[self.default_amount_id].items():
+            self.snapshot.filter(type=type_id).update(default_price=price)
+
+    def delete_snapshot(self):
+        with transaction.atomic():
+            self.snapshot.all().delete()
+            self.snapshot_created = None
+            ContributionRound.objects.filter(pk=self.pk).update(snapshot_created=None)
+
+    @instrumented('ContributionRound.get_statistics')
+    def get_statistics(self):
+        """
+        :return: RoundStatistics with all numbers of the summary page.
+        read from the stored ContributionRoundStats, which are rebuilt if they are missing or stale.
+        """
+        stats = ContributionRoundStats.objects.filter(round=self, stale=False).first()
+        if stats is None:
+            # the row must exist before it can be locked
+            ContributionRoundStats.objects.get_or_create(round=self, defaults={'stale': True})
+            with transaction.atomic():
+                # lock the row like ContributionSelectionQuerySet.upsert, such that selections saved concurrently
+                # are either included in the computation or applied to the stored statistics after it
+                ContributionRoundStats.objects.filter(round=self).update(stale=F('stale'))
+                stats = ContributionRoundStats.objects.get(round=self)
+                if stats.stale:
+                    statistics = RoundStatistics.compute(self)
+                    ContributionRoundStats.store(statistics)
+                    return statistics
+        stats.round = self
+        return stats.to_statistics()
+
+    @instrumented('ContributionRound.get_price_matrix')
+    def get_price_matrix(self, subscriptions=None):
+        """
+        :param subscriptions: restrict the matrix to these subscriptions. defaults to all subscriptions of this round
+        :return: PriceMatrix with the price of every option for each subscription, computed in a constant number of queries
+        """
+        return PriceMatrix.for_round(self, subscriptions)
+
+    def recalculate_prices(self, dry_run=False, batch_size=500):
+        """
+        recompute the stored price of the valid selections with an option from the current options and conditions.
+        selections with another amount keep their price.
+        bulk_update bypasses the signals, so modified_at is set here and the stored statistics are marked stale.
+        :param dry_run: only report the changes
+        :return: list of PriceChange of the selections whose price changed
+        """
+        prices = self.get_price_matrix()
+        changes = []
+        selections = self.valid_selections().exclude(selected_option=None).only(
+            'round', 'subscription', 'selected_option', 'price'
+        ).order_by('pk')
+        for selection in selections.iterator(chunk_size=batch_size):
+            if selection.subscription_id not in prices:
+                continue
+            price = round(prices.get(selection.subscription_id, selection.selected_option_id), 2)
+            if price != selection.price:
+                changes.append(PriceChange(selection, selection.price, price))
+        if changes and not dry_run:
+            now = timezone.now()
+            for selection, _, price in changes:
+                selection.price = price
+                selection.modified_at = now
+            with transaction.atomic():
+                ContributionSelection.objects.bulk_update(
+                    [change.selection for change in changes], ['price', 'modified_at'], batch_size=batch_size
+                )
+                ContributionRoundStats.objects.filter(round=self).mark_stale()
+        return changes
+
     def can_activate(self):
         return not ContributionRound.objects.exclude(pk=self.pk).filter(status=ContributionRound.STATUS_ACTIVE).exists()
 
+    @classmethod
+    def get_active(cls):
+        """
+        cached in the process until the version of the ROUNDS namespace in the cache backend changes,
+        which happens whenever a round is saved or deleted.
+        :return: a copy of the active contribution round or None
+        """
+        global _active_round
+        version = get_version(ROUNDS)
+        cached_version, contribution_round = _active_round
+        if cached_version != version:
+            count('rounds', misses=1)
+            contribution_round = cls.objects.filter(status=cls.STATUS_ACTIVE).first()
+            _active_round = (version, contribution_round)
+        else:
+            count('rounds', hits=1)
+        # the caller may modify the instance or cache values on it
+        return copy.copy(contribution_round)
+
     def __str__(self):
         return self.name
 
@@ -166,13 +453,42 @@ class ContributionOption(models.Model):
             round=self.round, subscription=subscription, selected_option=self
         ).get_total_price()
 
+    def get_part_price_expression(self, type_ref='type'):
+        """
+        :param type_ref: reference to the subscription type of the annotated subscription part
+        :return: expression of the price of a subscription part using this option, without rounding
+        """
+        condition_price = self.conditions.filter(subscription_type=OuterRef(type_ref)).values('price')[:1]
+        return Coalesce(
+            Subquery(condition_price),
+            F(f'{type_ref}__price') * Value(Decimal("%.4f" % self.multiplier)),
+            output_field=PRICE_FIELD,
+        )
+
+    def get_rounding_expression(self, amount):
+        """
+        :return: expression that rounds the given amount up to the amount_rounding of this option
+        """
+        # round the quotient first, as floating point databases (sqlite) would otherwise
+        # round up amounts that are an exact multiple of the amount_rounding
+        return Ceil(Round(amount / Value(self.amount_rounding), 6)) * Value(self.amount_rounding)
+
     @cached_property
     def price_by_type(self):
-        explicit_prices = {k: v for k, v in self.conditions.values_list('subscription_type', 'price')}
-        return {
-            sub_type: explicit_prices.get(sub_type.id, sub_type.price * Decimal("%.4f" % self.multiplier))
-            for sub_type in SubscriptionType.objects.all()
-        }
+        """
+        :return: dict {subscription type: price of a part of this type}
+        """
+        prices = self.price_by_type_id
+        return {sub_type: prices[sub_type.id] for sub_type in SubscriptionType.objects.filter(pk__in=prices)}
+
+    @cached_property
+    @instrumented('ContributionOption.price_by_type_id')
+    def price_by_type_id(self):
+        """
+        like price_by_type, without loading the subscription types
+        :return: dict {subscription type id: price of a part of this type}
+        """
+        return get_round_price_table(self.round)[self.id]
 
     class Meta:
         verbose_name = _('Beitrags-Option')
@@ -194,10 +510,76 @@ class ContributionCondition(models.Model):
         ]
 
 
+class ContributionSnapshotPart(models.Model):
+    """
+    subscription part that was subject to a contribution round when it was closed
+    """
+    round = models.ForeignKey(ContributionRound, on_delete=models.CASCADE, related_name='snapshot')
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='contribution_snapshots')
+    part = models.ForeignKey(SubscriptionPart, on_delete=models.CASCADE, related_name='contribution_snapshots')
+    type = models.ForeignKey(SubscriptionType, on_delete=models.CASCADE, related_name='contribution_snapshots')
+    nominal_price = models.DecimalField(_('Nominalbetrag'), max_digits=9, decimal_places=2)
+    default_price = models.DecimalField(_('Standardbetrag'), max_digits=15, decimal_places=6)
+
+    class Meta:
+        verbose_name = _('Eingefrorener Bestandteil')
+        verbose_name_plural = _('Eingefrorene Bestandteile')
+        constraints = [
+            models.UniqueConstraint(fields=['round', 'part'], name='unique_round_part'),
+        ]
+
+
 class ContributionSelectionQuerySet(models.QuerySet):
     def average_price(self):
         return self.aggregate(average_price=Avg('price')).get('average_price')
 
+    def upsert(self, selection):
+        """
+        insert the selection, or update the selection of the same round and subscription, in a single statement.
+        unlike update_or_create, concurrent submissions for the same subscription do not fail on the unique constraint.
+        bulk_create bypasses the signals, so the stored statistics and the contributor cache are updated here.
+        :param selection: unsaved ContributionSelection with its price
+        """
+        with transaction.atomic(using=self.db):
+            # writing to the stored statistics of the round locks them, also on backends without select_for_update.
+            # concurrent submissions are serialized, such that the previous selection read below is exact
+            ContributionRoundStats.objects.using(self.db).filter(round_id=selection.round_id).update(stale=F('stale'))
+            old = self.filter(
+                round_id=selection.round_id, subscription_id=selection.subscription_id
+            ).values(*SELECTION_FIELDS).first()
+            self.bulk_create(
+                [selection], update_conflicts=True,
+                unique_fields=['round', 'subscription']
+                if connections[self.db].features.supports_update_conflicts_with_target else None,
+                update_fields=['selected_option', 'price', 'contact_me', 'modification_date', 'modified_at'],
+            )
+            ContributionRoundStats.update_selection(old, {field: getattr(selection, field) for field in SELECTION_FIELDS})
+            if old is None:
+                ContributionSelection.invalidate_contributor([selection.subscription_id])
+
+    def with_nominal_price(self):
+        """
+        annotate nominal_price: the total price of the subscription parts that are subject to the round of each selection
+        """
+        parts = SubscriptionPart.objects.filter(
+            q_subject_to_round(OuterRef('round__cancellation_cutoff'), OuterRef('round__creation_cutoff')),
+            subscription=OuterRef('subscription'),
+        )
+        snapshot_parts = ContributionSnapshotPart.objects.filter(
+            round=OuterRef('round'), subscription=OuterRef('subscription')
+        )
+        output_field = DecimalField(max_digits=9, decimal_places=2)
+        return self.annotate(nominal_price=Case(
+            When(round__snapshot_created=None, then=Subquery(
+                parts.order_by().values('subscription').annotate(total=Sum('type__price')).values('total'),
+                output_field=output_field,
+            )),
+            default=Subquery(
+                snapshot_parts.order_by().values('subscription').annotate(total=Sum('nominal_price')).values('total'),
+                output_field=output_field,
+            ),
+        ))
+
 
 class ContributionSelection(models.Model):
     round = models.ForeignKey(ContributionRound, on_delete=models.CASCADE, related_name='selections')
@@ -208,6 +590,8 @@ class ContributionSelection(models.Model):
     contact_me = models.BooleanField(_('Kontaktiert mich, falls es nicht reicht'),
                                      default=False, null=True, blank=True,)
     modification_date = models.DateField(_('Zuletzt geändert'), auto_now=True)
+    # drives the incremental transfer into bills, see BillTransferMark
+    modified_at = models.DateTimeField(auto_now=True, editable=False)
     objects = ContributionSelectionQuerySet.as_manager()
 
     def get_parts(self):
@@ -215,22 +599,22 @@ class ContributionSelection(models.Model):
 
     def get_parts_with_prices(self):
         if self.subscription is not None:
-            prices_by_type = self.selected_option.price_by_type
-            total = 0
-            for part in self.get_parts():
-                price = prices_by_type.get(part.type, 0)
-                total += price
-                yield part, price
-            amount_rounding = self.selected_option.amount_rounding
-            rounded_total = ceil(total / amount_rounding) * amount_rounding
-            rounding = rounded_total - total
-            if rounding >= Decimal('0.01'):
-                yield _('Rundungsbetrag'), rounding
+            parts = list(self.get_parts())
+            composition = get_composition(part.type_id for part in parts)
+            prices = get_composition_prices(self.round, [self.selected_option], [composition])
+            yield from get_parts_with_prices(parts, prices[self.selected_option_id, composition])
 
     def get_total_price(self):
         return sum([price for _, price in self.get_parts_with_prices()])
 
     def get_nominal_price(self):
+        if hasattr(self, 'nominal_price'):
+            # annotated by ContributionSelectionQuerySet.with_nominal_price
+            return self.nominal_price
+        if self.round.has_snapshot:
+            return self.round.snapshot.filter(subscription=self.subscription_id).aggregate(
+                total=Sum('nominal_price')
+            ).get('total')
         return self.get_parts().aggregate(total=Sum('type__price')).get('total')
 
     def save(self, *args, **kwargs):
@@ -238,9 +622,338 @@ class ContributionSelection(models.Model):
             self.price = self.get_total_price()
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def _contributor_key(user_id):
+        return make_key(CONTRIBUTORS, get_version(CONTRIBUTORS), user_id)
+
+    @classmethod
+    def user_has_contributions(cls, user_id):
+        """
+        cached in the cache backend until invalidate_contributor is called for the user
+        or the version of the CONTRIBUTORS namespace changes
+        :return: True if the member of the user is primary member of a subscription with contributions
+        """
+        key = cls._contributor_key(user_id)
+        has_contributions = cache.get(key)
+        if has_contributions is None:
+            count('contributors', misses=1)
+            has_contributions = cls.objects.filter(subscription__primary_member__user_id=user_id).exists()
+            cache.set(key, has_contributions)
+        else:
+            count('contributors', hits=1)
+        return has_contributions
+
+    @classmethod
+    def invalidate_contributor(cls, subscription_ids):
+        user_ids = Subscription.objects.filter(pk__in=subscription_ids).values_list('primary_member__user_id', flat=True)
+        cache.delete_many([cls._contributor_key(user_id) for user_id in user_ids])
+
     class Meta:
         verbose_name = _('Beitrag')
         verbose_name_plural = _('Beiträge')
         constraints = [
             models.UniqueConstraint(fields=['round', 'subscription'], name='unique_round_subscription'),
         ]
+        indexes = [
+            # counts and sums by option of the statistics, price included to read them from the index only
+            models.Index(fields=['round', 'selected_option', 'price'], name='jcr_selection_round_option'),
+            # default order of the details table
+            models.Index(fields=['round', 'modification_date'], name='jcr_selection_round_date'),
+            # date filter of the admin
+            models.Index(fields=['modification_date'], name='jcr_selection_date'),
+            # selections changed since the last bill transfer, see BillTransferMark
+            models.Index(fields=['round', 'modified_at'], name='jcr_selection_round_modified'),
+        ]
+
+
+class ContributionRoundStatsQuerySet(models.QuerySet):
+    def mark_stale(self):
+        return self.update(stale=True)
+
+
+class ContributionRoundStats(models.Model):
+    """
+    stored RoundStatistics of a contribution round, to avoid recomputing them on every request.
+    kept up to date incrementally when selections change, and rebuilt when marked as stale.
+    """
+    round = models.OneToOneField(ContributionRound, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    subscription_count = models.IntegerField(default=0)
+    total_nominal = models.DecimalField(max_digits=11, decimal_places=2, default=Decimal(0))
+    total_unselected = models.DecimalField(max_digits=13, decimal_places=4, default=Decimal(0))
+    other_count = models.IntegerField(default=0)
+    other_total = models.DecimalField(max_digits=11, decimal_places=2, default=Decimal(0))
+    other_nominal = models.DecimalField(max_digits=11, decimal_places=2, default=Decimal(0))
+    stale = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = ContributionRoundStatsQuerySet.as_manager()
+
+    @classmethod
+    def store(cls, statistics):
+        """
+        replace the stored statistics of the round with the given RoundStatistics
+        """
+        with transaction.atomic():
+            stats, _ = cls.objects.update_or_create(round=statistics.round, defaults=dict(
+                subscription_count=statistics.subscription_count,
+                total_nominal=statistics.total_nominal,
+                total_unselected=statistics.total_unselected,
+                other_count=statistics.other_amounts,
+                other_total=statistics.other_amounts_total,
+                other_nominal=statistics.other_nominal,
+                stale=False,
+            ))
+            stats.options.all().delete()
+            ContributionOptionStats.objects.bulk_create([
+                ContributionOptionStats(round_stats=stats, option=option, count=count, total=total)
+                for option, count, total in statistics.option_totals
+            ])
+        return stats
+
+    def to_statistics(self):
+        options = self.options.select_related('option').order_by('option__sort_order')
+        selections = {option_stats.option_id: (option_stats.count, option_stats.total) for option_stats in options}
+        selections[None] = (self.other_count, self.other_total)
+        return RoundStatistics(
+            self.round,
+            options=[option_stats.option for option_stats in options],
+            selections=selections,
+            subscription_count=self.subscription_count,
+            total_nominal=self.total_nominal,
+            total_unselected=self.total_unselected,
+            other_nominal=self.other_nominal,
+        )
+
+    @classmethod
+    def update_selection(cls, old, new):
+        """
+        apply the change of a selection to the stored statistics of its round.
+        :param old: dict with round_id, subscription_id, selected_option_id and price of the selection before the change,
+                    or None if it was created
+        :param new: the same values after the change, or None if it was deleted
+        """
+        changes = defaultdict(list)
+        for values, sign in ((old, -1), (new, 1)):
+            if values is not None:
+                changes[values['round_id'], values['subscription_id']].append((values, sign))
+        for (round_id, subscription_id), selection_changes in changes.items():
+            stats = cls.objects.filter(round_id=round_id, stale=False).select_related('round').first()
+            if stats is None:
+                # nothing to update
+                continue
+            subscription = Subscription.objects.filter(pk=subscription_id).first()
+            if subscription is None or not stats.round.is_eligible(subscription):
+                # not a valid selection
+                continue
+            stats._update_subscription(subscription_id, selection_changes)
+
+    def _update_subscription(self, subscription_id, selection_changes):
+        option_deltas = defaultdict(lambda: [0, 0])
+        for values, sign in selection_changes:
+            option_deltas[values['selected_option_id']][0] += sign
+            option_deltas[values['selected_option_id']][1] += sign * (values['price'] or 0)
+        other_count, other_total = option_deltas.pop(None, (0, 0))
+        # the subscription got its first or lost its last selection in this round
+        added = sum(sign for _, sign in selection_changes)
+
+        changes = {}
+        for option_id, (option_count, total) in option_deltas.items():
+            if (option_count or total) and not ContributionOptionStats.objects.filter(option_id=option_id).update(
+                count=F('count') + option_count, total=F('total') + total
+            ):
+                # option is not known to the stored statistics
+                changes['stale'] = True
+        if other_count or other_total:
+            changes.update(other_count=F('other_count') + other_count, other_total=F('other_total') + other_total)
+        if other_count or added:
+            prices = self.round.get_price_matrix([subscription_id])
+            nominal = prices.nominal(subscription_id)
+            if other_count:
+                changes['other_nominal'] = F('other_nominal') + other_count * nominal
+            if added:
+                default_price = nominal
+                if self.round.default_amount_id:
+                    default_price = prices.get(subscription_id, self.round.default_amount_id)
+                changes['total_unselected'] = F('total_unselected') - added * default_price
+        if changes:
+            ContributionRoundStats.objects.filter(pk=self.pk).update(**changes)
+
+    class Meta:
+        verbose_name = _('Beitragsrunden-Statistik')
+        verbose_name_plural = _('Beitragsrunden-Statistiken')
+
+
+class ContributionOptionStats(models.Model):
+    option = models.OneToOneField(ContributionOption, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    round_stats = models.ForeignKey(ContributionRoundStats, on_delete=models.CASCADE, related_name='options')
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=11, decimal_places=2, default=Decimal(0))
+
+    class Meta:
+        verbose_name = _('Beitrags-Option-Statistik')
+        verbose_name_plural = _('Beitrags-Option-Statistiken')
+
+
+class BillTransferJobQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(status__in=(BillTransferJob.STATUS_PENDING, BillTransferJob.STATUS_RUNNING))
+
+
+class BillTransferJob(models.Model):
+    """
+    transfer of the selections of a round into the bills of juntagrico_billing (or its undo),
+    processed in chunks by the run_bill_transfer_jobs worker.
+    the checkpoint is committed together with each chunk, so an interrupted job resumes after the last chunk.
+    """
+    ACTION_TRANSFER = 'T'
+    ACTION_UNDO = 'U'
+    ACTIONS = [
+        (ACTION_TRANSFER, _('Übertragen')),
+        (ACTION_UNDO, _('Rückgängig machen')),
+    ]
+    STATUS_PENDING = 'P'
+    STATUS_RUNNING = 'R'
+    STATUS_DONE = 'D'
+    STATUS_FAILED = 'F'
+    STATUSES = [
+        (STATUS_PENDING, _('Wartend')),
+        (STATUS_RUNNING, _('Läuft')),
+        (STATUS_DONE, _('Abgeschlossen')),
+        (STATUS_FAILED, _('Fehlgeschlagen')),
+    ]
+
+    round = models.ForeignKey(ContributionRound, on_delete=models.CASCADE, related_name='bill_transfer_jobs')
+    action = models.CharField(_('Aktion'), max_length=1, choices=ACTIONS, default=ACTION_TRANSFER)
+    # transfer all selections instead of only those changed since the last transfer
+    full = models.BooleanField(default=False)
+    status = models.CharField(_('Status'), max_length=1, choices=STATUSES, default=STATUS_PENDING)
+    # juntagrico_billing is optional, therefore no foreign keys
+    business_year_id = models.PositiveIntegerField()
+    bill_item_type_id = models.PositiveIntegerField(null=True)
+    total = models.PositiveIntegerField(null=True)
+    processed = models.PositiveIntegerField(default=0)
+    # pk of the last processed selection (transfer) or BillTransferItem (undo)
+    checkpoint = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    creation_date = models.DateTimeField(auto_now_add=True)
+    start_date = models.DateTimeField(null=True)
+    heartbeat = models.DateTimeField(null=True)
+    finish_date = models.DateTimeField(null=True)
+
+    objects = BillTransferJobQuerySet.as_manager()
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    @property
+    def progress(self):
+        """
+        :return: percentage of processed entries or None if the job has not started yet
+        """
+        if self.total is None:
+            return None
+        if self.total == 0:
+            return 100
+        return 100 * self.processed / self.total
+
+    def process_chunk(self, chunk_size):
+        """
+        process the next chunk of the job and commit its results together with the new checkpoint
+        :return: True if the job is finished
+        """
+        from juntagrico_contribution import billing
+        with transaction.atomic():
+            job = BillTransferJob.objects.select_for_update().get(pk=self.pk)
+            if job.is_finished:
+                return True
+            if job.action == self.ACTION_UNDO:
+                billing.undo_chunk(job, chunk_size)
+            else:
+                billing.transfer_chunk(job, chunk_size)
+            job.heartbeat = timezone.now()
+            if job.processed >= job.total:
+                job.status = self.STATUS_DONE
+                job.finish_date = job.heartbeat
+            else:
+                job.status = self.STATUS_RUNNING
+            job.save()
+        self.refresh_from_db()
+        return self.is_finished
+
+    def fail(self, error):
+        self.status = self.STATUS_FAILED
+        self.error = error
+        self.finish_date = timezone.now()
+        self.save(update_fields=['status', 'error', 'finish_date'])
+
+    def to_json(self):
+        return {
+            'id': self.pk,
+            'action': self.action,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'total': self.total,
+            'processed': self.processed,
+            'progress': self.progress,
+            'created': self.created,
+            'updated': self.updated,
+            'deleted': self.deleted,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'error': self.error,
+        }
+
+    class Meta:
+        verbose_name = _('Rechnungs-Übertragung')
+        verbose_name_plural = _('Rechnungs-Übertragungen')
+
+
+class BillTransferMark(models.Model):
+    """
+    high-water mark of the transfers of a round into the bills of a business year with a bill item type.
+    selections modified before synced_until are already transferred, except for the failed ones.
+    deleted whenever the eligibility or nominal prices of the selections may have changed.
+    """
+    # transactions that saved a selection may commit after a transfer started reading
+    OVERLAP = datetime.timedelta(minutes=1)
+
+    round = models.ForeignKey(ContributionRound, on_delete=models.CASCADE, related_name='bill_transfer_marks')
+    business_year_id = models.PositiveIntegerField()
+    bill_item_type_id = models.PositiveIntegerField(null=True)
+    # None until the first transfer completed
+    synced_until = models.DateTimeField(null=True)
+    # ids of selections whose primary member had no bill
+    failed = models.JSONField(default=list)
+
+    def changed_selections(self, selections):
+        """
+        :param selections: queryset of ContributionSelections of the round
+        :return: the selections that have to be transferred again
+        """
+        if self.synced_until is None:
+            return selections
+        return selections.filter(Q(modified_at__gt=self.synced_until - self.OVERLAP) | Q(pk__in=self.failed))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['round', 'business_year_id', 'bill_item_type_id'], name='unique_bill_transfer_mark'
+            ),
+        ]
+
+
+class BillTransferItem(models.Model):
+    """
+    bill item created by a transfer of a round, such that the undo of a round only deletes the items of its transfers
+    """
+    round = models.ForeignKey(ContributionRound, on_delete=models.CASCADE, related_name='bill_transfer_items')
+    # juntagrico_billing is optional, therefore no foreign keys
+    business_year_id = models.PositiveIntegerField()
+    bill_item_type_id = models.PositiveIntegerField(null=True)
+    bill_item_id = models.PositiveIntegerField(unique=True)
@@ -0,0 +1,288 @@
+from array import array
+from collections import Counter, defaultdict
+from decimal import Decimal
+from math import ceil
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from juntagrico.entity.subtypes import SubscriptionType
+
+from juntagrico_contribution.cache import PRICES, count, get_version, make_key
+
+# prices are stored as integers of this unit, which is the finest possible amount_rounding of an option
+PRICE_UNIT = Decimal('0.0001')
+
+
+def round_up(amount, amount_rounding):
+    return ceil(amount / amount_rounding) * amount_rounding
+
+
+def get_price_table(options, type_prices=None):
+    """
+    load the prices of all subscription types for the given options in 2 queries
+    :param type_prices: dict {subscription type id: nominal price}, if already loaded
+    :return: dict {option id: {subscription type id: price}}
+    """
+    from juntagrico_contribution.models import ContributionCondition
+
+    explicit_prices = defaultdict(dict)
+    for option_id, type_id, price in ContributionCondition.objects.filter(option__in=options).values_list(
+        'option', 'subscription_type', 'price'
+    ):
+        explicit_prices[option_id][type_id] = price
+    if type_prices is None:
+        type_prices = dict(SubscriptionType.objects.values_list('id', 'price'))
+    return {
+        option.id: {
+            type_id: explicit_prices[option.id].get(type_id, price * Decimal("%.4f" % option.multiplier))
+            for type_id, price in type_prices.items()
+        } for option in options
+    }
+
+
+def get_round_price_table(contribution_round, round_options=None):
+    """
+    price table of all options of the round, shared between requests through the django cache.
+    the nominal prices are included for the option None.
+    :param round_options: all options of the round, if already loaded
+    :return: dict {option id or None: {subscription type id: price}}
+    """
+    key = make_key(PRICES, get_version(PRICES), contribution_round.id, 'table')
+    price_table = cache.get(key)
+    if price_table is None:
+        count('price_table', misses=1)
+        type_prices = dict(SubscriptionType.objects.values_list('id', 'price'))
+        if round_options is None:
+            round_options = contribution_round.options.all()
+        price_table = get_price_table(round_options, type_prices)
+        price_table[None] = type_prices
+        cache.set(key, price_table)
+    else:
+        count('price_table', hits=1)
+    return price_table
+
+
+def get_composition(type_ids):
+    """
+    :param type_ids: subscription type ids of the parts of a subscription
+    :return: hashable multiset of the type ids
+    """
+    return tuple(sorted(Counter(type_ids).items()))
+
+
+class PriceChange(NamedTuple):
+    selection: object
+    old_price: Decimal
+    new_price: Decimal
+
+
+class CompositionPrice(NamedTuple):
+    # price of a part by subscription type id
+    prices: dict
+    # rounded up to the amount_rounding of the option
+    total: Decimal
+
+
+def get_composition_prices(contribution_round, options, compositions, round_options=None):
+    """
+    prices of the options for subscriptions with the given compositions, memoized in the django cache.
+    the nominal prices are returned for the option None.
+    the memo is invalidated by bumping the PRICES version on changes to options, conditions or subscription types.
+    :param compositions: iterable of compositions as returned by get_composition
+    :param round_options: all options of the round, if already loaded
+    :return: dict {(option id or None, composition): CompositionPrice}
+    """
+    version = get_version(PRICES)
+    keys = {
+        make_key(PRICES, version, contribution_round.id, getattr(option, 'id', None),
+                 '-'.join(f'{type_id}x{number}' for type_id, number in composition)): (option, composition)
+        for option in [*options, None] for composition in set(compositions)
+    }
+    found = cache.get_many(keys)
+    missing = {key: keys[key] for key in keys if key not in found}
+    count('composition_prices', hits=len(found), misses=len(missing))
+    if missing:
+        price_table = get_round_price_table(contribution_round, round_options)
+        computed = {}
+        for key, (option, composition) in missing.items():
+            prices = {type_id: price_table[getattr(option, 'id', None)].get(type_id, 0) for type_id, _ in composition}
+            total = sum(prices[type_id] * number for type_id, number in composition)
+            if option is not None:
+                total = round_up(total, option.amount_rounding)
+            computed[key] = CompositionPrice(prices, total)
+        cache.set_many(computed)
+        found.update(computed)
+    return {(getattr(option, 'id', None), composition): found[key] for key, (option, composition) in keys.items()}
+
+
+class PriceMatrix:
+    """
+    rounded price of every option for each subscription of a contribution round.
+    the prices are kept in one flat array with a row per subscription and a column per option,
+    followed by a column with the nominal price.
+    """
+
+    def __init__(self, options, subscription_ids, values):
+        self.options = options
+        self._columns = {option.id: column for column, option in enumerate(options)}
+        self._width = len(options) + 1
+        self._rows = {subscription_id: row for row, subscription_id in enumerate(subscription_ids)}
+        self._values = values
+
+    @classmethod
+    def for_round(cls, contribution_round, subscriptions=None):
+        """
+        :param subscriptions: restrict the matrix to these subscriptions. defaults to all subscriptions of the round
+        """
+        options = list(contribution_round.options.all())
+        if subscriptions is None:
+            subscriptions = contribution_round.subscriptions()
+        if contribution_round.has_snapshot:
+            return cls._for_snapshot(contribution_round, options, subscriptions)
+        type_ids = defaultdict(list)
+        for subscription_id, type_id in contribution_round.subscription_parts().filter(
+            subscription__in=subscriptions
+        ).values_list('subscription', 'type'):
+            type_ids[subscription_id].append(type_id)
+        compositions = {subscription_id: get_composition(types) for subscription_id, types in type_ids.items()}
+
+        # most subscriptions share one of only a few compositions
+        prices = get_composition_prices(contribution_round, options, compositions.values(), options)
+        rows_by_composition = {}
+        values = array('q')
+        for composition in compositions.values():
+            if composition not in rows_by_composition:
+                rows_by_composition[composition] = [
+                    int(prices[option_id, composition].total / PRICE_UNIT)
+                    for option_id in [*(option.id for option in options), None]
+                ]
+            values.extend(rows_by_composition[composition])
+        return cls(options, compositions.keys(), values)
+
+    @classmethod
+    def _for_snapshot(cls, contribution_round, options, subscriptions):
+        """
+        closed rounds: the types, nominal and default prices of the snapshot parts.
+        the other options are priced from the nominal prices of the snapshot, like update_snapshot_prices
+        """
+        parts = defaultdict(list)
+        type_prices = {}
+        for subscription_id, type_id, nominal_price, default_price in contribution_round.snapshot.filter(
+            subscription__in=subscriptions
+        ).values_list('subscription', 'type', 'nominal_price', 'default_price'):
+            parts[subscription_id].append((type_id, nominal_price, default_price))
+            type_prices[type_id] = nominal_price
+        price_table = get_price_table(options, type_prices)
+        values = array('q')
+        for subscription_parts in parts.values():
+            for option in options:
+                if option.id == contribution_round.default_amount_id:
+                    total = sum(default_price for _, _, default_price in subscription_parts)
+                else:
+                    total = sum(price_table[option.id][type_id] for type_id, _, _ in subscription_parts)
+                values.append(int(round_up(total, option.amount_rounding) / PRICE_UNIT))
+            values.append(int(sum(nominal_price for _, nominal_price, _ in subscription_parts) / PRICE_UNIT))
+        return cls(options, parts.keys(), values)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, subscription_id):
+        return subscription_id in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def _get(self, subscription_id, column):
+        return self._values[self._rows[subscription_id] * self._width + column] * PRICE_UNIT
+
+    def get(self, subscription_id, option):
+        """
+        :return: price of the option for the subscription, rounded to the amount_rounding of the option
+        """
+        return self._get(subscription_id, self._columns[getattr(option, 'id', option)])
+
+    def nominal(self, subscription_id):
+        return self._get(subscription_id, self._width - 1)
+
+    def row(self, subscription_id):
+        """
+        :return: dict {option: price} of all options for the subscription
+        """
+        return {option: self.get(subscription_id, option) for option in self.options}
+
+    def total(self, option=None):
+        """
+        :return: sum of the prices of the option over all subscriptions. sum of the nominal prices if option is None
+        """
+        column = self._width - 1 if option is None else self._columns[getattr(option, 'id', option)]
+        return sum(self._values[column::self._width]) * PRICE_UNIT
+
+
+def get_parts_with_prices(parts, composition_price):
+    """
+    :return: list of (part, price), followed by the rounding if it is noticeable
+    """
+    parts_with_prices = [(part, composition_price.prices.get(part.type_id, 0)) for part in parts]
+    rounding = composition_price.total - sum(price for _, price in parts_with_prices)
+    if rounding >= Decimal('0.01'):
+        parts_with_prices.append((_('Rundungsbetrag'), rounding))
+    return parts_with_prices
+
+
+class OptionQuote:
+    """
+    price of one option for a subscription with its breakdown.
+    offers the same methods as ContributionSelection for the templates.
+    """
+
+    def __init__(self, option, parts_with_prices):
+        self.selected_option = option
+        self._parts_with_prices = parts_with_prices
+        self.price = sum(price for _, price in parts_with_prices)
+
+    def get_parts_with_prices(self):
+        return self._parts_with_prices
+
+    def get_total_price(self):
+        return self.price
+
+
+class PriceQuote:
+    """
+    prices of all options of a contribution round for one subscription.
+    loads the parts of the subscription that are subject to the round once,
+    the prices of its composition come from the memo of get_composition_prices.
+    """
+
+    def __init__(self, contribution_round, subscription, options=None):
+        round_options = None
+        if options is None:
+            options = round_options = list(contribution_round.options.all())
+        self.options = list(options)
+        self.parts = list(
+            contribution_round.filter_parts(subscription.parts).select_related('type__size__product')
+        )
+        composition = get_composition(part.type_id for part in self.parts)
+        prices = get_composition_prices(contribution_round, self.options, [composition], round_options)
+        self._quotes = {
+            option.id: OptionQuote(option, get_parts_with_prices(self.parts, prices[option.id, composition]))
+            for option in self.options
+        }
+
+    def __getitem__(self, option):
+        """
+        :return: OptionQuote of the option or option id
+        """
+        return self._quotes[getattr(option, 'id', option)]
+
+    def get_option(self, option_id):
+        return self._quotes[option_id].selected_option
+
+    def price(self, option):
+        return self[option].price
+
+    @property
+    def nominal_price(self):
+        return sum(part.type.price for part in self.parts)
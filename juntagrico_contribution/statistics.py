@@ -0,0 +1,124 @@
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+
+class RoundStatistics:
+    """
+    numbers shown on the summary page of a contribution round.
+    use `ContributionRound.get_statistics()` to compute them in a constant number of queries.
+    """
+
+    def __init__(self, contribution_round, options, selections, subscription_count, total_nominal,
+                 total_unselected, other_nominal):
+        """
+        :param options: list of the options of the round
+        :param selections: dict of {option id or None for other amounts: (count, total price)} of the valid selections
+        :param other_nominal: total nominal price of the subscriptions that selected an other amount
+        """
+        self.round = contribution_round
+        self._options = options
+        self._selections = selections
+        self.subscription_count = subscription_count
+        self.total_nominal = total_nominal
+        self.total_unselected = total_unselected
+        self.other_nominal = other_nominal
+
+    @classmethod
+    def compute(cls, contribution_round):
+        selections = {
+            row['selected_option']: (row['count'], row['total'] or Decimal(0))
+            for row in contribution_round.valid_selections().order_by().values('selected_option').annotate(
+                count=Count('id'), total=Sum('price')
+            )
+        }
+        other_nominal = Decimal(0)
+        if selections.get(None):
+            other_nominal = contribution_round.other_amounts.with_nominal_price().aggregate(
+                total=Sum('nominal_price')
+            ).get('total') or Decimal(0)
+        return cls(
+            contribution_round,
+            options=list(contribution_round.options.all()),
+            selections=selections,
+            subscription_count=contribution_round.subscriptions().count(),
+            total_nominal=contribution_round.get_total_nominal(),
+            total_unselected=contribution_round.get_total_unselected(),
+            other_nominal=other_nominal,
+        )
+
+    def _count(self, option_id):
+        return self._selections.get(option_id, (0, Decimal(0)))[0]
+
+    @property
+    def submitted(self):
+        return sum(count for count, _ in self._selections.values())
+
+    @property
+    def total_selected(self):
+        return sum((total for _, total in self._selections.values()), Decimal(0))
+
+    @property
+    def options(self):
+        """
+        :return: list of tuples (option, number of valid selections of this option)
+        """
+        return [(option, self._count(option.id)) for option in self._options]
+
+    @property
+    def option_totals(self):
+        """
+        :return: list of tuples (option, number of valid selections of this option, total price of these selections)
+        """
+        return [(option, *self._selections.get(option.id, (0, Decimal(0)))) for option in self._options]
+
+    @property
+    def other_amounts(self):
+        return self._count(None)
+
+    @property
+    def other_amounts_total(self):
+        return self._selections.get(None, (0, Decimal(0)))[1]
+
+    @property
+    def other_amounts_average_increase(self):
+        if not self.other_amounts or not self.other_nominal:
+            return Decimal(0.0)
+        amount = self.other_amounts_total
+        return ((Decimal(amount) / Decimal(self.other_nominal)) - Decimal(1.0)) * Decimal(100.0)
+
+    @property
+    def current_total(self):
+        return self.total_selected + self.total_unselected
+
+    @property
+    def effective_target_amount(self):
+        if self.round.target_multiplier:
+            return round(Decimal(self.round.target_multiplier) * self.total_nominal)
+        return self.round.target_amount
+
+    def differences(self, other):
+        """
+        :return: list of tuples (name, value, value of other) of all numbers that differ from the other statistics
+        """
+        values = self._values()
+        other_values = other._values()
+        return [
+            (name, values.get(name, 0), other_values.get(name, 0))
+            for name in dict.fromkeys([*values, *other_values])
+            if values.get(name, 0) != other_values.get(name, 0)
+        ]
+
+    def _values(self):
+        values = {
+            'subscription_count': self.subscription_count,
+            'total_nominal': self.total_nominal,
+            'total_unselected': self.total_unselected,
+            'other_amounts': self.other_amounts,
+            'other_amounts_total': self.other_amounts_total,
+            'other_nominal': self.other_nominal,
+        }
+        for option, count, total in self.option_totals:
+            values[f'{option} count'] = count
+            values[f'{option} total'] = total
+        return values
@@ -14,7 +14,9 @@ def percent(value, total):
 
 @register.simple_tag
 def show_contribution_round_menu(request):
-    return (
-        ContributionRound.objects.filter(status=ContributionRound.STATUS_ACTIVE).exists()
-        or ContributionSelection.objects.filter(subscription__primary_member=request.user.member).exists()
-    )
+    if ContributionRound.get_active() is not None:
+        return True
+    # the menu may be rendered more than once per request
+    if not hasattr(request, 'jcr_has_contributions'):
+        request.jcr_has_contributions = ContributionSelection.user_has_contributions(request.user.pk)
+    return request.jcr_has_contributions
@@ -1,5 +1,7 @@
+from django.core.cache import cache
 from juntagrico.tests import JuntagricoTestCase
 
+from juntagrico_contribution.forms import ContributionSelectionForm
 from juntagrico_contribution.models import ContributionRound, ContributionOption
 
 
@@ -12,6 +14,23 @@ class ContributionTestCase(JuntagricoTestCase):
         cls.set_up_sub()
         cls.set_up_contribution_round()
 
+    def setUp(self):
+        super().setUp()
+        # cached prices would outlive the rollback of the test database
+        cache.clear()
+
+    def select(self, subscription, selection, other_amount=None):
+        """
+        submit the selection form of the round for the subscription
+        :return: the saved ContributionSelection
+        """
+        form = ContributionSelectionForm(self.contribution_round, subscription, {
+            'selection': selection, 'other_amount': other_amount, 'contact_me': False,
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        return self.contribution_round.selections.get(subscription=subscription)
+
     @classmethod
     def set_up_contribution_round(cls):
         cls.contribution_round = ContributionRound.objects.create(
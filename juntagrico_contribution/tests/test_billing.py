@@ -0,0 +1,151 @@
+import datetime
+from io import StringIO
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ContributionTestCase
+from ..models import BillTransferJob, BillTransferMark, ContributionRound, ContributionSelection
+
+
+@skipUnless(apps.is_installed('juntagrico_billing'), 'juntagrico_billing is not installed')
+class BillTransferTests(ContributionTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        from juntagrico_billing.models.bill import Bill, BillItemType, BusinessYear
+        cls.business_year = BusinessYear.objects.create(
+            start_date=datetime.date(2000, 1, 1), end_date=datetime.date(2000, 12, 31), name='2000'
+        )
+        cls.item_type = BillItemType.objects.create(name='Beitrag', booking_account='1000')
+        cls.bill = Bill.objects.create(
+            business_year=cls.business_year, member=cls.member,
+            bill_date=datetime.date(2000, 1, 1), booking_date=datetime.date(2000, 1, 1),
+        )
+        cls.selection = ContributionSelection.objects.create(
+            round=cls.contribution_round, subscription=cls.sub, price=1200
+        )
+        # member2 has no bill
+        ContributionSelection.objects.create(round=cls.contribution_round, subscription=cls.sub2, price=1300)
+        cls.contribution_round.status = ContributionRound.STATUS_CLOSED
+        cls.contribution_round.save()
+
+    def transfer(self, **data):
+        """
+        start a transfer on the summary page and run the worker
+        :return: the finished BillTransferJob
+        """
+        self.assertPost(reverse('jcr:admin-transfer-bill', args=(self.contribution_round.id,)), {
+            'business_year': self.business_year.pk, 'bill_item_type': self.item_type.pk, **data,
+        }, code=302, member=self.admin)
+        call_command('run_bill_transfer_jobs', '--once', stdout=StringIO())
+        self.bill.refresh_from_db()
+        job = BillTransferJob.objects.latest('pk')
+        self.assertEqual(job.status, BillTransferJob.STATUS_DONE)
+        return job
+
+    def assertOutcomes(self, job, created=0, updated=0, skipped=0, failed=0):
+        self.assertEqual(
+            (job.created, job.updated, job.skipped, job.failed, job.processed),
+            (created, updated, skipped, failed, created + updated + skipped + failed),
+        )
+
+    def test_transfer(self):
+        job = BillTransferJob.objects.create(
+            round=self.contribution_round, business_year_id=self.business_year.pk,
+            bill_item_type_id=self.item_type.pk, full=True,
+        )
+        # a chunk takes a constant number of queries
+        with self.assertNumQueries(23):
+            self.assertTrue(job.process_chunk(200))
+        job.refresh_from_db()
+        self.assertOutcomes(job, created=1, failed=1)
+        self.assertEqual([item.amount for item in self.bill.items.all()], [200.0])
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.amount, 200.0)
+
+        self.assertOutcomes(self.transfer(full=True), skipped=1, failed=1)
+
+        self.selection.price = 1500
+        self.selection.save()
+        self.assertOutcomes(self.transfer(full=True), updated=1, failed=1)
+        self.assertEqual(self.bill.amount, 500.0)
+
+        # zero amounts are skipped, existing bill items are kept
+        self.selection.price = 1000
+        self.selection.save()
+        self.assertOutcomes(self.transfer(full=True), skipped=1, failed=1)
+        self.assertEqual([item.amount for item in self.bill.items.all()], [500.0])
+
+    def test_incremental_transfer(self):
+        self.assertOutcomes(self.transfer(), created=1, failed=1)
+        # nothing changed: after the overlap, only the failed selection is retried
+        BillTransferMark.objects.update(synced_until=timezone.now() + BillTransferMark.OVERLAP)
+        self.assertOutcomes(self.transfer(), failed=1)
+        BillTransferMark.objects.update(synced_until=timezone.now() + BillTransferMark.OVERLAP)
+        self.selection.price = 1500
+        self.selection.save()
+        self.assertOutcomes(self.transfer(), updated=1, failed=1)
+        # reopening the round invalidates the mark
+        self.contribution_round.status = ContributionRound.STATUS_ACTIVE
+        self.contribution_round.save()
+        self.assertFalse(BillTransferMark.objects.exists())
+
+    def test_transfer_view(self):
+        self.transfer()
+        self.assertEqual([item.amount for item in self.bill.items.all()], [200.0])
+        self.assertEqual(self.transfer(undo=1).deleted, 1)
+        self.assertFalse(self.bill.items.exists())
+        self.assertEqual(self.bill.amount, 0.0)
+
+    def test_undo_only_own_items(self):
+        from juntagrico_billing.models.bill import Bill
+        self.transfer()
+        # another round transfers into the same business year with the same bill item type
+        other_round = ContributionRound.objects.create(
+            name='Beitragsrunde 2', description='Beschreibung der Beitragsrunde 2', target_amount=1000.00,
+        )
+        ContributionSelection.objects.create(round=other_round, subscription=self.sub2, price=1300)
+        other_bill = Bill.objects.create(
+            business_year=self.business_year, member=self.member2,
+            bill_date=datetime.date(2000, 1, 1), booking_date=datetime.date(2000, 1, 1),
+        )
+        BillTransferJob.objects.create(
+            round=other_round, business_year_id=self.business_year.pk, bill_item_type_id=self.item_type.pk, full=True,
+        ).process_chunk(200)
+        self.assertEqual(self.transfer(undo=1).deleted, 1)
+        self.assertFalse(self.bill.items.exists())
+        self.assertEqual([item.amount for item in other_bill.items.all()], [300.0])
+        self.assertEqual(list(BillTransferMark.objects.values_list('round', flat=True)), [other_round.pk])
+
+    def test_resume_job(self):
+        job = BillTransferJob.objects.create(
+            round=self.contribution_round, business_year_id=self.business_year.pk, bill_item_type_id=self.item_type.pk
+        )
+        # worker is interrupted after the first chunk
+        self.assertFalse(job.process_chunk(1))
+        self.assertEqual((job.status, job.processed, job.total), (BillTransferJob.STATUS_RUNNING, 1, 2))
+        self.assertEqual(job.checkpoint, self.selection.pk)
+        call_command('run_bill_transfer_jobs', '--once', '--chunk-size', '1', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, BillTransferJob.STATUS_DONE)
+        self.assertEqual((job.created, job.failed, job.processed), (1, 1, 2))
+        self.assertEqual(self.bill.items.get().amount, 200.0)
+
+        self.client.force_login(self.admin.user)
+        response = self.client.get(reverse('jcr:admin-transfer-status', args=(self.contribution_round.id,)))
+        self.assertEqual(response.json()['job']['progress'], 100)
+
+    def test_pending_job(self):
+        BillTransferJob.objects.create(
+            round=self.contribution_round, business_year_id=self.business_year.pk, bill_item_type_id=self.item_type.pk
+        )
+        self.assertGet(reverse('jcr:admin-summary', args=(self.contribution_round.id,)), member=self.admin)
+        self.assertPost(reverse('jcr:admin-transfer-bill', args=(self.contribution_round.id,)), {
+            'business_year': self.business_year.pk, 'bill_item_type': self.item_type.pk,
+        }, code=302, member=self.admin)
+        self.assertEqual(BillTransferJob.objects.count(), 1)
+
@@ -0,0 +1,118 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase
+from juntagrico.entity.depot import Depot
+from juntagrico.entity.subtypes import SubscriptionProduct, SubscriptionSize
+from juntagrico.tests import JuntagricoTestCase
+
+from ..forms import ContributionSelectionForm
+from ..models import ContributionOption, ContributionRound, ContributionRoundStats, ContributionSelection
+from ..statistics import RoundStatistics
+
+
+class ConcurrentSelectionTests(TransactionTestCase):
+    """
+    submissions run in threads with their own database connection, so the test data must be committed.
+    needs a database server or a sqlite test database on disk, see DATABASES['default']['TEST'] in testsettings.
+    """
+    workers = 8
+    submissions = 5
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # connections to the shared in-memory database fail on table locks instead of waiting for them
+            self.skipTest('in-memory sqlite database')
+        self.set_up_subscriptions()
+        self.set_up_contribution_round()
+        self.contribution_round.get_statistics()
+
+    def set_up_subscriptions(self):
+        contact = JuntagricoTestCase.create_member('contact@email.org')
+        depot = Depot.objects.create(
+            name='depot', contact=contact, weekday=1, location=JuntagricoTestCase.create_location()
+        )
+        product = SubscriptionProduct.objects.create(name='product')
+        size = SubscriptionSize.objects.create(name='size', long_name='size', units=1, product=product)
+        self.subscriptions = []
+        for i, price in enumerate((1000, 1500)):
+            subscription = JuntagricoTestCase.create_sub(
+                depot, JuntagricoTestCase.create_sub_type(size, price=price), datetime.date.today()
+            )
+            JuntagricoTestCase.create_member(f'member{i}@email.org').join_subscription(subscription, True)
+            self.subscriptions.append(subscription)
+
+    def set_up_contribution_round(self):
+        self.contribution_round = ContributionRound.objects.create(
+            name='Beitragsrunde', target_amount=10000, status=ContributionRound.STATUS_ACTIVE,
+        )
+        self.options = [
+            ContributionOption.objects.create(round=self.contribution_round, name='Mindestpreis', multiplier=0.8),
+            ContributionOption.objects.create(round=self.contribution_round, name='Richtpreis'),
+        ]
+
+    def submit(self, worker):
+        try:
+            for i in range(self.submissions):
+                # every worker submits for the same subscriptions, alternating the option
+                subscription = self.subscriptions[i % 2]
+                option = self.options[(worker + i) % 2]
+                form = ContributionSelectionForm(self.contribution_round, subscription, {
+                    'selection': option.pk, 'contact_me': False,
+                })
+                if form.is_valid():
+                    form.save()
+        finally:
+            connection.close()
+
+    def test_parallel_submissions(self):
+        with ThreadPoolExecutor(self.workers) as executor:
+            # raises the first exception of a worker, e.g. an IntegrityError or 'database is locked'
+            list(executor.map(self.submit, range(self.workers)))
+
+        selections = ContributionSelection.objects.filter(round=self.contribution_round)
+        # one selection per subscription
+        self.assertEqual(selections.count(), len(self.subscriptions))
+        self.assertEqual(set(selections.values_list('subscription', flat=True)), {s.pk for s in self.subscriptions})
+        for selection in selections:
+            self.assertEqual(selection.price, selection.get_total_price())
+        stats = ContributionRoundStats.objects.get(round=self.contribution_round)
+        self.assertEqual(stats.to_statistics().differences(RoundStatistics.compute(self.contribution_round)), [])
+
+    def test_submission_while_computing_statistics(self):
+        computed = threading.Event()
+        submitted = threading.Event()
+        compute = RoundStatistics.compute
+
+        def slow_compute(contribution_round):
+            statistics = compute(contribution_round)
+            computed.set()
+            # the submission would be lost if it could be saved before the statistics are stored
+            submitted.wait(1)
+            return statistics
+
+        def get_statistics():
+            try:
+                self.contribution_round.get_statistics()
+            finally:
+                connection.close()
+
+        ContributionRoundStats.objects.mark_stale()
+        with mock.patch.object(RoundStatistics, 'compute', side_effect=slow_compute), \
+                ThreadPoolExecutor(1) as executor:
+            future = executor.submit(get_statistics)
+            self.assertTrue(computed.wait(5))
+            form = ContributionSelectionForm(self.contribution_round, self.subscriptions[0], {
+                'selection': self.options[1].pk, 'contact_me': False,
+            })
+            self.assertTrue(form.is_valid())
+            form.save()
+            submitted.set()
+            future.result()
+
+        stats = ContributionRoundStats.objects.get(round=self.contribution_round)
+        self.assertFalse(stats.stale)
+        self.assertEqual(stats.to_statistics().differences(RoundStatistics.compute(self.contribution_round)), [])
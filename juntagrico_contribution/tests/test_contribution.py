@@ -1,7 +1,10 @@
+import datetime
+
+from django.db.models import Sum
 from django.urls import reverse
 from juntagrico.tests import JuntagricoTestCase
 from . import ContributionTestCase
-from ..models import ContributionRound
+from ..models import ContributionRound, ContributionSelection, ContributionCondition
 from decimal import Decimal
 
 
@@ -79,6 +82,54 @@ class ContributionTests(NoRoundTests, ContributionTestCase):
         )
         self.assertEqual(self.contribution_round.total_unselected, expected_total)
 
+    def test_total_unselected_with_conditions_and_rounding(self):
+        self.option1.amount_rounding = Decimal('0.5')
+        self.option1.save()
+        ContributionCondition.objects.create(option=self.option1, subscription_type=self.sub_type, price=Decimal('333.33'))
+        self.contribution_round.default_amount = self.option1
+        self.contribution_round.save()
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub2, price=1500)
+        expected_total = sum(
+            self.option1.price_for(subscription)
+            for subscription in self.contribution_round.subscriptions().exclude(pk=self.sub2.pk)
+        )
+        self.assertEqual(expected_total, Decimal('667'))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.contribution_round.total_unselected, expected_total)
+
+    def test_with_nominal_price(self):
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub, price=1200)
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.cancelled_sub, price=1300)
+        for cutoff in (None, datetime.date.today() - datetime.timedelta(1), datetime.date.today()):
+            self.contribution_round.cancellation_cutoff = cutoff
+            self.contribution_round.save()
+            for selection in self.contribution_round.selections.with_nominal_price():
+                selection.round = self.contribution_round
+                self.assertEqual(selection.nominal_price, selection.get_parts().aggregate(total=Sum('type__price'))['total'])
+
+    def test_other_amounts_average_increase(self):
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub, price=1200)
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub2, price=1300)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.contribution_round.other_amounts_average_increase, Decimal(25))
+
+    def test_statistics(self):
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub, selected_option=self.option2)
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub2, price=1500)
+        stats = self.contribution_round.get_statistics()
+        self.assertEqual(stats.subscription_count, self.contribution_round.subscriptions().count())
+        self.assertEqual(stats.submitted, self.contribution_round.submitted)
+        self.assertEqual(stats.total_selected, self.contribution_round.total_selected)
+        self.assertEqual(stats.total_unselected, self.contribution_round.total_unselected)
+        self.assertEqual(stats.total_nominal, self.contribution_round.total_nominal)
+        self.assertEqual(stats.other_amounts, self.contribution_round.other_amounts.count())
+        self.assertEqual(stats.other_amounts_average_increase, self.contribution_round.other_amounts_average_increase)
+        self.assertEqual(stats.effective_target_amount, self.contribution_round.effective_target_amount)
+        self.assertEqual(stats.options, [
+            (option, option.valid_selections().count()) for option in self.contribution_round.options.all()
+        ])
+
+
 class ClosedRoundTests(ContributionTests):
     @classmethod
     def setUpTestData(cls):
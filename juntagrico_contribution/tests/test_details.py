@@ -0,0 +1,144 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.template.defaultfilters import floatformat
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from impersonate.helpers import check_allow_for_user
+from juntagrico.entity.member import Member, SubscriptionMembership
+from juntagrico.entity.subs import Subscription, SubscriptionPart
+
+from . import ContributionTestCase
+from ..details import co_members, set_can_impersonate, set_content, subscriptions_with_details
+from ..models import ContributionSelection
+
+
+class DetailsTests(ContributionTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.member4.join_subscription(cls.sub2)
+        ContributionSelection.objects.create(round=cls.contribution_round, subscription=cls.sub, price=1200)
+
+    def add_subscriptions(self, count, **selection):
+        for i in range(count):
+            subscription = self.create_sub_now(self.depot, [self.sub_type, self.sub_type2])
+            self.create_member(f'details{i}@email.org').join_subscription(subscription, True)
+            self.create_member(f'details{i}-co@email.org', last_name=f'Muster{i}').join_subscription(subscription)
+            ContributionSelection.objects.create(
+                round=self.contribution_round, subscription=subscription, selected_option=self.option2, **selection
+            )
+
+    def get_data(self, code=200, **params):
+        self.client.force_login(self.admin.user)
+        response = self.client.get(reverse('jcr:admin-details-data'), {
+            'round': self.contribution_round.pk, 'draw': 1, 'start': 0, 'length': 10, **params
+        })
+        self.assertEqual(response.status_code, code)
+        return response.json() if code == 200 else response
+
+    def test_page(self):
+        self.assertGet(reverse('jcr:admin-details') + f'?round={self.contribution_round.pk}', member=self.admin)
+
+    def add_edge_cases(self):
+        """
+        subscription with a deactivated part, a repeated type, a co-member that left and a deactivated co-member
+        """
+        yesterday = datetime.date.today() - datetime.timedelta(1)
+        subscription = self.create_sub_now(self.depot, [self.sub_type, self.sub_type, self.sub_type2, self.sub_type3])
+        SubscriptionPart.objects.filter(subscription=subscription, type=self.sub_type3).update(
+            cancellation_date=yesterday, deactivation_date=yesterday
+        )
+        self.create_member('edge@email.org').join_subscription(subscription, True)
+        left = self.create_member('edge-left@email.org')
+        left.join_subscription(subscription)
+        SubscriptionMembership.objects.filter(member=left).update(leave_date=yesterday)
+        deactivated = self.create_member('edge-deactivated@email.org')
+        deactivated.join_subscription(subscription)
+        Member.objects.filter(pk=deactivated.pk).update(deactivation_date=yesterday)
+        self.create_member('edge-staying@email.org').join_subscription(subscription)
+
+    def test_same_as_subscription(self):
+        self.add_subscriptions(2)
+        self.add_edge_cases()
+        # including waiting, inactive and canceled subscriptions and one without primary member
+        subscriptions = list(subscriptions_with_details(self.contribution_round, Subscription.objects.all()))
+        set_content(subscriptions)
+        for subscription in subscriptions:
+            fresh = Subscription.objects.get(pk=subscription.pk)
+            self.assertEqual(subscription.content_strings(), fresh.content_strings())
+            self.assertEqual(co_members(subscription), list(fresh.co_members()))
+            for selection in subscription.current_contribution:
+                self.assertEqual(selection.nominal_price, ContributionSelection.objects.get(pk=selection.pk).get_nominal_price())
+
+    def test_set_content_queries(self):
+        self.add_subscriptions(2)
+        subscriptions = list(Subscription.objects.all())
+        with self.assertNumQueries(1):
+            set_content(subscriptions)
+            for subscription in subscriptions:
+                subscription.content_strings()
+
+    def test_same_as_impersonate_start(self):
+        superuser = self.create_member('super@email.org')
+        User.objects.filter(pk=superuser.user.pk).update(is_superuser=True)
+        staff = self.create_member('staff@email.org')
+        User.objects.filter(pk=staff.user.pk).update(is_staff=True)
+        members = list(Member.objects.select_related('user'))
+        for allow_superuser in (False, True):
+            for requester in (superuser, staff, self.member):
+                request = RequestFactory().get('/')
+                request.user = User.objects.get(pk=requester.user.pk)
+                with self.subTest(allow_superuser=allow_superuser, requester=requester.email), \
+                        override_settings(IMPERSONATE={'ALLOW_SUPERUSER': allow_superuser}):
+                    set_can_impersonate(request, members)
+                    self.assertEqual(
+                        [member.jcr_can_impersonate for member in members],
+                        [check_allow_for_user(request, member.user) for member in members],
+                    )
+
+    def test_constant_queries(self):
+        self.get_data()
+        with self.assertNumQueries(16):
+            data = self.get_data()
+        count = data['recordsTotal']
+        self.add_subscriptions(5)
+        with self.assertNumQueries(16):
+            data = self.get_data()
+        self.assertEqual((data['recordsTotal'], len(data['data'])), (count + 5, count + 5))
+        self.assertIn('details4-co@email.org', ''.join(cell for row in data['data'] for cell in row))
+        self.assertIn(reverse('impersonate-start', args=(self.member4.user.pk,)), str(data['data']))
+
+    def test_paging_and_ordering(self):
+        self.add_subscriptions(3, price=1500)
+        data = self.get_data(**{'order[0][column]': 1, 'order[0][dir]': 'desc', 'start': 1, 'length': 2})
+        self.assertEqual((data['recordsFiltered'], len(data['data'])), (data['recordsTotal'], 2))
+        self.assertTrue(data['data'][0][1].startswith(floatformat(1500, '2g')))
+        data = self.get_data(**{'order[0][column]': 1, 'order[0][dir]': 'asc'})
+        self.assertEqual(data['data'][0][0], 'Kein Gebot')
+        self.assertTrue(data['data'][-1][1].startswith(floatformat(1500, '2g')))
+
+    def test_invalid_parameters(self):
+        for params in ({'draw': 'x'}, {'start': '1.5'}, {'length': ''}, {'length': -1}, {'length': 0}):
+            with self.subTest(**params):
+                self.get_data(400, **params)
+        data = self.get_data(start=-5)
+        self.assertEqual(len(data['data']), data['recordsTotal'])
+        data = self.get_data(**{'order[0][column]': 'x', 'order[0][dir]': 'asc'})
+        self.assertEqual(len(data['data']), data['recordsTotal'])
+
+    def test_search_and_total(self):
+        self.add_subscriptions(2, price=1500, contact_me=True)
+        self.assertEqual(self.get_data()['total'], 1200 + 2 * 1500)
+        data = self.get_data(**{'search[value]': 'first muster1'})
+        self.assertEqual((data['recordsFiltered'], data['total']), (1, 1500))
+        data = self.get_data(**{'columns[0][search][value]': self.option2.name})
+        self.assertEqual((data['recordsFiltered'], data['total']), (2, 3000))
+        data = self.get_data(**{'columns[0][search][value]': 'anderer'})
+        self.assertEqual((data['recordsFiltered'], data['total']), (1, 1200))
+        data = self.get_data(**{'columns[0][search][value]': 'kein'})
+        self.assertEqual((data['recordsFiltered'], data['total']), (data['recordsTotal'] - 3, 0))
+        data = self.get_data(**{'columns[2][search][value]': 'ja'})
+        self.assertEqual((data['recordsFiltered'], data['total']), (2, 3000))
+        data = self.get_data(**{'columns[2][search][value]': 'n'})
+        self.assertEqual((data['recordsFiltered'], data['total']), (1, 1200))
@@ -0,0 +1,86 @@
+import datetime
+import random
+
+from django.db.models import Prefetch
+from juntagrico.entity.subs import Subscription, SubscriptionPart
+
+from . import ContributionTestCase
+from ..models import ContributionRound
+
+
+class EligibilityTests(ContributionTestCase):
+    """
+    property test: is_eligible agrees with subscriptions() on generated subscriptions and cutoffs
+    """
+    SEED = 20240101
+    ROUNDS = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.trial_type = cls.create_sub_type(cls.sub_size, trial_days=30)
+        rng = random.Random(cls.SEED)
+        for _ in range(30):
+            subscription = Subscription.objects.create(depot=cls.depot)
+            cls.randomize_dates(rng, Subscription.objects.filter(pk=subscription.pk))
+            for _ in range(rng.randint(0, 3)):
+                part = SubscriptionPart.objects.create(
+                    subscription=subscription, type=rng.choice([cls.sub_type, cls.sub_type2, cls.trial_type])
+                )
+                cls.randomize_dates(rng, SubscriptionPart.objects.filter(pk=part.pk))
+
+    @classmethod
+    def random_date(cls, rng, none_probability=0.4):
+        if rng.random() < none_probability:
+            return None
+        return datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randint(0, 60))
+
+    @classmethod
+    def randomize_dates(cls, rng, queryset):
+        # update() bypasses auto_now_add of creation_date
+        queryset.update(
+            creation_date=cls.random_date(rng, 0.1),
+            cancellation_date=cls.random_date(rng),
+            deactivation_date=cls.random_date(rng, 0.8),
+        )
+
+    def assertAgrees(self, contribution_round, subscriptions):
+        expected = set(contribution_round.subscriptions().values_list('pk', flat=True))
+        self.eligible_counts.append(len(expected))
+        for subscription in subscriptions:
+            self.assertEqual(
+                contribution_round.is_eligible(subscription), subscription.pk in expected,
+                f'subscription {subscription.pk}, cutoffs {contribution_round.creation_cutoff}, '
+                f'{contribution_round.cancellation_cutoff}'
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.eligible_counts = []
+
+    def test_agrees_with_subscriptions(self):
+        rng = random.Random(self.SEED)
+        for _ in range(self.ROUNDS):
+            self.contribution_round.creation_cutoff = self.random_date(rng)
+            self.contribution_round.cancellation_cutoff = self.random_date(rng)
+            self.contribution_round.save()
+            self.assertAgrees(self.contribution_round, Subscription.objects.all())
+            prefetched = Subscription.objects.prefetch_related(
+                Prefetch('parts', queryset=SubscriptionPart.objects.select_related('type'))
+            )
+            # subscriptions() for the expected result, the subscriptions and their parts
+            with self.assertNumQueries(3):
+                self.assertAgrees(self.contribution_round, prefetched)
+        # the generated data covers eligible and ineligible subscriptions
+        subscription_count = Subscription.objects.count()
+        self.assertTrue(any(0 < count < subscription_count for count in self.eligible_counts))
+        self.assertGreater(len(set(self.eligible_counts)), 2)
+
+    def test_agrees_with_snapshot(self):
+        self.contribution_round.cancellation_cutoff = datetime.date(2024, 1, 20)
+        self.contribution_round.status = ContributionRound.STATUS_CLOSED
+        self.contribution_round.save()
+        # later changes do not affect the snapshot
+        SubscriptionPart.objects.update(deactivation_date=datetime.date(2024, 3, 1))
+        self.assertTrue(self.contribution_round.subscriptions().exists())
+        self.assertAgrees(self.contribution_round, Subscription.objects.all())
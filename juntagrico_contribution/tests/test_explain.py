@@ -0,0 +1,39 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from . import ContributionTestCase
+from ..explain import CapturedQuery, sequential_scans
+from ..models import ContributionSelection
+
+
+class ExplainTests(ContributionTestCase):
+    def explain(self, *args):
+        out = StringIO()
+        call_command('explain_contribution_queries', str(self.contribution_round.pk), *args, stdout=out)
+        return out.getvalue()
+
+    def test_command(self):
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub2, price=1200)
+        output = self.explain('--large-table', '1')
+        for path in ('summary', 'details', 'select', 'bill_transfer'):
+            self.assertRegex(output, rf'== {path}: \d+ queries, [\d.]+ ms ==')
+        self.assertIn('! sequential scan of', output)
+        # the selection of the select path is rolled back
+        self.assertEqual(self.contribution_round.selections.count(), 1)
+
+    def test_large_table(self):
+        output = self.explain('--paths', 'summary')
+        self.assertNotIn('== details', output)
+        self.assertIn('0 sequential scans of tables with at least 1000 rows', output)
+
+    @skipUnless(connection.vendor == 'sqlite', 'sqlite specific')
+    def test_sqlite(self):
+        with self.assertRaises(CommandError):
+            self.explain('--analyze')
+        query = CapturedQuery('SELECT 1 FROM "juntagrico_subscriptionpart" U0 INNER JOIN "juntagrico_subscriptiontype" U1', [])
+        query.plan = ['SCAN U1', '  SEARCH U0 USING INDEX type_id (type_id=?)', 'SCAN juntagrico_member',
+                      'SCAN juntagrico_depot USING COVERING INDEX name']
+        self.assertEqual(sequential_scans(query), ['juntagrico_subscriptiontype', 'juntagrico_member'])
@@ -0,0 +1,52 @@
+import csv
+import io
+from decimal import Decimal
+
+from django.urls import reverse
+
+from . import ContributionTestCase
+from ..export import get_rows
+from ..models import ContributionSelection
+
+
+class ExportTests(ContributionTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ContributionSelection.objects.create(
+            round=cls.contribution_round, subscription=cls.sub, selected_option=cls.option2, price=1200, contact_me=True
+        )
+
+    def export(self, export_format):
+        self.client.force_login(self.admin.user)
+        return self.client.get(reverse('jcr:admin-details-export'), {
+            'round': self.contribution_round.pk, 'format': export_format
+        })
+
+    def test_rows(self):
+        rows = {row[2]: row for row in get_rows(self.contribution_round)}
+        self.assertEqual(set(rows), set(self.contribution_round.subscriptions().values_list('pk', flat=True)))
+        self.assertEqual(rows[self.sub.pk][4:8], [self.option2.name, Decimal(1200), Decimal(1000), 'Ja'])
+        self.assertEqual(rows[self.sub.pk][3], ', '.join(self.sub.content_strings()))
+        self.assertEqual(rows[self.sub2.pk][4:8], ['Kein Gebot', None, self.sub2.parts.get().type.price, ''])
+
+    def test_chunks(self):
+        for i in range(4):
+            subscription = self.create_sub_now(self.depot, [self.sub_type])
+            self.create_member(f'export{i}@email.org').join_subscription(subscription, True)
+        # main query and the content per chunk of 2 subscriptions
+        with self.assertNumQueries(1 + 4):
+            rows = list(get_rows(self.contribution_round, chunk_size=2))
+        self.assertEqual(len(rows), 7)
+
+    def test_csv(self):
+        response = self.export('csv')
+        self.assertTrue(response.streaming)
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(lines), 1 + self.contribution_round.subscriptions().count())
+        self.assertIn([self.member.get_name(), self.member.email, str(self.sub.pk)], [line[:3] for line in lines])
+
+    def test_xlsx(self):
+        response = self.export('xlsx')
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.assertEqual(b''.join(response.streaming_content)[:2], b'PK')
@@ -0,0 +1,62 @@
+from django.test import override_settings
+from django.urls import reverse
+
+from . import ContributionTestCase
+from ..cache import ROUNDS, bump_version, get_counters, reset_counters
+from ..instrumentation import get_metrics, reset_metrics, to_prometheus
+from ..models import ContributionRound, ContributionSelection
+
+
+@override_settings(JCR_INSTRUMENTATION=True)
+class InstrumentationTests(ContributionTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_metrics()
+        reset_counters()
+
+    def test_view_metrics(self):
+        self.assertGet(reverse('jcr:admin-summary', args=(self.contribution_round.pk,)), member=self.admin)
+        metrics = get_metrics()
+        self.assertEqual(metrics['jcr:admin-summary'].count, 1)
+        self.assertGreater(metrics['jcr:admin-summary'].queries, metrics['ContributionRound.get_statistics'].queries)
+        self.assertEqual(sum(metrics['jcr:admin-summary'].buckets), 1)
+
+        response = self.assertGet(reverse('jcr:admin-metrics'), member=self.admin)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('jcr_call_duration_seconds_bucket{name="jcr:admin-summary",le="+Inf"} 1\n', text)
+        self.assertIn('jcr_call_duration_seconds_count{name="ContributionRound.get_statistics"} 1\n', text)
+        self.assertIn(f'jcr_call_queries_total{{name="jcr:admin-summary"}} {metrics["jcr:admin-summary"].queries}\n', text)
+        self.assertIn('# TYPE jcr_cache_lookups_total counter\n', text)
+
+    def test_cache_hit_ratio(self):
+        prices = self.option1.price_by_type_id
+        self.assertEqual(self.contribution_round.options.get(pk=self.option1.pk).price_by_type_id, prices)
+        self.assertIn('jcr_cache_hit_ratio{cache="price_table"} 0.5\n', to_prometheus())
+        self.assertEqual(get_metrics()['ContributionOption.price_by_type_id'].count, 2)
+
+    def test_round_and_contributor_lookups(self):
+        bump_version(ROUNDS)
+        ContributionRound.get_active()
+        ContributionRound.get_active()
+        ContributionSelection.user_has_contributions(self.member.user.pk)
+        ContributionSelection.user_has_contributions(self.member.user.pk)
+        counters = get_counters()
+        self.assertEqual(counters['rounds'], {'hits': 1, 'misses': 1})
+        self.assertEqual(counters['contributors'], {'hits': 1, 'misses': 1})
+        self.assertIn('jcr_cache_hit_ratio{cache="contributors"} 0.5\n', to_prometheus())
+
+    def test_staff_only(self):
+        self.assertGet(reverse('jcr:admin-metrics'), member=self.member2, code=302)
+
+    @override_settings(JCR_INSTRUMENTATION=False)
+    def test_disabled(self):
+        self.assertGet(reverse('jcr:admin-summary', args=(self.contribution_round.pk,)), member=self.admin)
+        self.assertEqual(get_metrics(), {})
+        self.assertGet(reverse('jcr:admin-metrics'), member=self.admin, code=404)
+
+    @override_settings(JCR_SLOW_CALL_THRESHOLD=0)
+    def test_slow_call_logging(self):
+        with self.assertLogs('juntagrico_contribution.instrumentation', 'WARNING') as logs:
+            self.contribution_round.get_total_nominal()
+        self.assertRegex(logs.output[0], r'slow call ContributionRound.get_total_nominal: [\d.]+ s, 1 queries')
@@ -0,0 +1,61 @@
+import datetime
+
+from django.urls import reverse
+
+from . import ContributionTestCase
+from ..models import ContributionRound, ContributionSelection
+
+
+class RoundListTests(ContributionTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ContributionSelection.objects.create(round=cls.contribution_round, subscription=cls.sub, price=1200)
+        # not a valid selection
+        ContributionSelection.objects.create(round=cls.contribution_round, subscription=cls.sub3, price=100)
+
+    def create_round(self, name, **kwargs):
+        contribution_round = ContributionRound.objects.create(name=name, target_amount=1000, **kwargs)
+        ContributionSelection.objects.create(round=contribution_round, subscription=self.sub2, price=1500)
+        return contribution_round
+
+    def assertMetrics(self, contribution_round):
+        annotated = ContributionRound.objects.with_metrics().get(pk=contribution_round.pk)
+        contribution_round = ContributionRound.objects.get(pk=contribution_round.pk)
+        self.assertEqual(
+            (annotated.subscription_count, annotated.submitted, annotated.total_selected,
+             annotated.total_nominal, annotated.effective_target_amount),
+            (contribution_round.subscriptions().count(), contribution_round.submitted, contribution_round.total_selected,
+             contribution_round.total_nominal, contribution_round.effective_target_amount),
+        )
+
+    def test_metrics(self):
+        self.assertMetrics(self.contribution_round)
+        self.assertMetrics(self.create_round('Leer', target_multiplier=1.1, creation_cutoff=datetime.date(2100, 1, 1)))
+        cutoff_round = self.create_round('Stichtag', target_multiplier=1.5, cancellation_cutoff=datetime.date.today())
+        self.sub2.cancel()
+        self.assertMetrics(cutoff_round)
+
+    def test_snapshot_metrics(self):
+        self.contribution_round.status = ContributionRound.STATUS_CLOSED
+        self.contribution_round.save()
+        # later changes do not affect the closed round
+        self.sub.deactivate(datetime.date.today())
+        annotated = ContributionRound.objects.with_metrics().get(pk=self.contribution_round.pk)
+        self.assertEqual((annotated.subscription_count, annotated.submitted), (3, 1))
+        self.assertMetrics(self.contribution_round)
+
+    def test_constant_queries(self):
+        url = reverse('jcr:admin-list')
+        self.client.force_login(self.admin.user)
+        self.client.get(url)
+        with self.assertNumQueries(13):
+            self.client.get(url)
+        for i in range(3):
+            self.create_round(f'Runde {i}', target_multiplier=1.2)
+        closed = self.create_round('Geschlossen', status=ContributionRound.STATUS_CLOSED)
+        # the menu reloads the active round once after rounds changed
+        self.client.get(url)
+        with self.assertNumQueries(13):
+            response = self.client.get(url)
+        self.assertContains(response, closed.name)
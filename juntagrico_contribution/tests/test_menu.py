@@ -0,0 +1,44 @@
+from django.test import RequestFactory
+
+from . import ContributionTestCase
+from ..models import ContributionRound, ContributionSelection
+from ..templatetags.jcr.common import show_contribution_round_menu
+
+
+class MenuTests(ContributionTestCase):
+    def show_menu(self, member):
+        request = RequestFactory().get('/')
+        request.user = member.user
+        return show_contribution_round_menu(request)
+
+    def set_status(self, status):
+        self.contribution_round.status = status
+        self.contribution_round.save()
+
+    def test_active_round(self):
+        self.assertTrue(self.show_menu(self.member2))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.show_menu(self.member2))
+        active_round = ContributionRound.get_active()
+        self.assertEqual(active_round, self.contribution_round)
+        # a copy is handed out
+        active_round.name = 'changed'
+        self.assertEqual(ContributionRound.get_active().name, self.contribution_round.name)
+
+        self.set_status(ContributionRound.STATUS_DRAFT)
+        self.assertIsNone(ContributionRound.get_active())
+        self.assertFalse(self.show_menu(self.member2))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.show_menu(self.member2))
+
+    def test_contributions(self):
+        self.set_status(ContributionRound.STATUS_CLOSED)
+        self.assertFalse(self.show_menu(self.member))
+        selection = ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub, price=1000)
+        self.assertTrue(self.show_menu(self.member))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.show_menu(self.member))
+        # not the primary member
+        self.assertFalse(self.show_menu(self.member3))
+        selection.delete()
+        self.assertFalse(self.show_menu(self.member))
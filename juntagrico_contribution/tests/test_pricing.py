@@ -0,0 +1,110 @@
+from decimal import Decimal
+
+from django.urls import reverse
+from juntagrico.entity.subtypes import SubscriptionType
+
+from . import ContributionTestCase
+from ..models import ContributionCondition, ContributionOption, ContributionSelection
+from ..cache import get_counters, reset_counters
+from ..pricing import PriceQuote, get_price_table
+
+
+class PriceMatrixTests(ContributionTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.option1.amount_rounding = Decimal('5')
+        cls.option1.save()
+        ContributionCondition.objects.create(option=cls.option2, subscription_type=cls.sub_type2, price=Decimal('1234.56'))
+
+    def test_matrix_matches_single_prices(self):
+        with self.assertNumQueries(4):
+            matrix = self.contribution_round.get_price_matrix()
+        subscriptions = list(self.contribution_round.subscriptions())
+        self.assertEqual(len(matrix), len(subscriptions))
+        for subscription in subscriptions:
+            self.assertIn(subscription.id, matrix)
+            for option in self.contribution_round.options.all():
+                self.assertEqual(matrix.get(subscription.id, option), option.price_for(subscription))
+            selection = ContributionSelection(round=self.contribution_round, subscription=subscription)
+            self.assertEqual(matrix.nominal(subscription.id), selection.get_nominal_price())
+
+    def test_totals(self):
+        matrix = self.contribution_round.get_price_matrix()
+        self.assertEqual(matrix.total(), self.contribution_round.total_nominal)
+        self.assertEqual(matrix.total(self.option2), sum(matrix.row(sub_id)[self.option2] for sub_id in matrix))
+
+    def test_memo(self):
+        matrix = self.contribution_round.get_price_matrix()
+        # options and parts only
+        with self.assertNumQueries(2):
+            self.assertEqual(list(self.contribution_round.get_price_matrix()._values), list(matrix._values))
+        # invalidated by changes to subscription types, options and conditions
+        self.sub_type.price = 2000
+        self.sub_type.save()
+        self.assertEqual(self.contribution_round.get_price_matrix().nominal(self.sub.id), Decimal(2000))
+        self.option1.multiplier = 2
+        self.option1.save()
+        self.assertEqual(self.contribution_round.get_price_matrix().get(self.sub.id, self.option1), Decimal(4000))
+        ContributionCondition.objects.create(option=self.option1, subscription_type=self.sub_type, price=Decimal(12))
+        self.assertEqual(self.contribution_round.get_price_matrix().get(self.sub.id, self.option1), Decimal(15))
+
+    def test_shared_price_table(self):
+        reset_counters()
+        option = ContributionOption.objects.select_related('round').get(pk=self.option2.pk)
+        self.assertEqual(option.price_by_type_id, get_price_table([option])[option.id])
+        # another instance, e.g. in the next request
+        option = ContributionOption.objects.select_related('round').get(pk=self.option2.pk)
+        with self.assertNumQueries(0):
+            prices = option.price_by_type_id
+        self.assertEqual(get_counters()['price_table'], {'hits': 1, 'misses': 1})
+        ContributionCondition.objects.create(option=self.option2, subscription_type=self.sub_type, price=Decimal(1))
+        option = ContributionOption.objects.select_related('round').get(pk=self.option2.pk)
+        self.assertEqual(option.price_by_type_id, {**prices, self.sub_type.id: Decimal(1)})
+        self.assertEqual(get_counters()['price_table'], {'hits': 1, 'misses': 2})
+
+    def test_price_by_type(self):
+        ContributionCondition.objects.create(option=self.option1, subscription_type=self.sub_type, price=Decimal(12))
+        prices = self.option1.price_by_type
+        self.assertEqual(prices[self.sub_type], Decimal(12))
+        self.assertEqual(prices[self.sub_type2], self.sub_type2.price * Decimal('0.8'))
+        self.assertEqual(len(prices), SubscriptionType.objects.count())
+
+    def test_restricted_to_subscriptions(self):
+        matrix = self.contribution_round.get_price_matrix([self.sub])
+        self.assertEqual(list(matrix), [self.sub.id])
+
+
+class PriceQuoteTests(ContributionTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.option1.amount_rounding = Decimal('7')
+        cls.option1.save()
+        ContributionCondition.objects.create(option=cls.option2, subscription_type=cls.sub_type, price=Decimal('1234.56'))
+
+    def test_quote_matches_selections(self):
+        for subscription in self.contribution_round.subscriptions():
+            quote = PriceQuote(self.contribution_round, subscription)
+            for option in self.contribution_round.options.all():
+                selection = ContributionSelection(
+                    round=self.contribution_round, subscription=subscription, selected_option=option
+                )
+                self.assertEqual(quote.price(option), option.price_for(subscription))
+                self.assertEqual(quote[option].get_parts_with_prices(), list(selection.get_parts_with_prices()))
+            self.assertEqual(quote.nominal_price, selection.get_nominal_price())
+
+    def test_select_page_queries(self):
+        self.client.force_login(self.member.user)
+        url = reverse('jcr:select')
+        self.client.get(url)
+        with self.assertNumQueries(27):
+            self.client.get(url)
+        ContributionOption.objects.create(round=self.contribution_round, name='Option 3', multiplier=1.2)
+        self.client.get(url)
+        with self.assertNumQueries(27):
+            response = self.client.get(url)
+        self.assertContains(response, 'Option 3')
+        response = self.client.post(url, {'selection': self.option1.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.contribution_round.selections.get().price, self.option1.price_for(self.sub))
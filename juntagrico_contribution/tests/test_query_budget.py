@@ -0,0 +1,185 @@
+import sys
+import sysconfig
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import django
+import polymorphic
+from django.core.cache import cache
+from django.db import connection
+from django.template.base import Node
+from django.test import override_settings
+from django.urls import reverse
+
+from . import ContributionTestCase
+from .. import urls
+from ..models import ContributionCondition, ContributionOption, ContributionRound, ContributionSelection
+
+# query plumbing, the call site is the code that uses it
+LIBRARY_PATHS = (str(Path(django.__file__).parent), str(Path(polymorphic.__file__).parent))
+STDLIB_PATH = sysconfig.get_paths()['stdlib']
+PACKAGES_PATH = sysconfig.get_paths()['purelib']
+
+
+def is_library(filename):
+    if filename.startswith(PACKAGES_PATH):
+        return filename.startswith(LIBRARY_PATHS)
+    return filename.startswith((STDLIB_PATH, '<frozen')) or filename == __file__
+
+
+def call_site():
+    """
+    :return: innermost frame outside of django, polymorphic, the standard library and this module,
+        with the innermost template node that caused the query
+    """
+    site = template = None
+    frame = sys._getframe(2)
+    while frame and site is None:
+        filename = frame.f_code.co_filename
+        if template is None and isinstance(frame.f_locals.get('self'), Node):
+            node = frame.f_locals['self']
+            template = f'{node.origin.template_name}:{node.token.lineno}'
+        if not is_library(filename):
+            site = f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return f'{site} ({template})' if template else str(site)
+
+
+class QueryRecorder:
+    """
+    records the sql of the queries by call site
+    """
+
+    def __init__(self):
+        self.queries = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries[call_site()].append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return sum(len(queries) for queries in self.queries.values())
+
+    def counts(self):
+        return Counter({site: len(queries) for site, queries in self.queries.items()})
+
+    def report(self, baseline=None):
+        """
+        :param baseline: only report the call sites that ran more queries than in this recorder
+        """
+        counts = self.counts() - (baseline.counts() if baseline else Counter())
+        lines = []
+        for site, count in counts.most_common():
+            lines.append(f'{count}x {site}')
+            lines.extend(f'    {sql}' for sql in dict.fromkeys(self.queries[site]))
+        return '\n'.join(lines)
+
+
+@override_settings(JCR_INSTRUMENTATION=True)
+class QueryBudgetTests(ContributionTestCase):
+    """
+    every url of jcr runs at two data sizes within the query_budget of its view
+    and with the same number of queries at both sizes.
+    the instrumentation must not add queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.member4.join_subscription(cls.sub2)
+        ContributionSelection.objects.create(
+            round=cls.contribution_round, subscription=cls.sub, selected_option=cls.option2, price=1000
+        )
+        cls.bidders = [cls.member2]
+
+    def add_data(self, count):
+        """
+        more subscriptions with co-members and selections, and another option with a condition
+        """
+        option = ContributionOption.objects.create(round=self.contribution_round, name='Solidarpreis', multiplier=1.2)
+        ContributionCondition.objects.create(option=option, subscription_type=self.sub_type2, price=1500)
+        for i in range(count):
+            subscription = self.create_sub_now(self.depot, [self.sub_type, self.sub_type2])
+            member = self.create_member(f'budget{i}@email.org')
+            member.join_subscription(subscription, True)
+            self.create_member(f'budget{i}-co@email.org').join_subscription(subscription)
+            if i:
+                ContributionSelection.objects.create(
+                    round=self.contribution_round, subscription=subscription, selected_option=option, price=2500
+                )
+            else:
+                self.bidders.append(member)
+
+    def get_requests(self, size):
+        """
+        :return: dict url name -> list of (member, method, url, data)
+        """
+        round_id = self.contribution_round.pk
+        return {
+            'view': [(self.member, 'get', reverse('jcr:view'), {})],
+            'select': [
+                (self.member, 'get', reverse('jcr:select'), {}),
+                (self.bidders[size], 'post', reverse('jcr:select'), {'selection': self.option2.pk}),
+            ],
+            'admin-list': [(self.admin, 'get', reverse('jcr:admin-list'), {})],
+            'admin-details': [(self.admin, 'get', reverse('jcr:admin-details'), {'round': round_id})],
+            'admin-details-data': [(self.admin, 'get', reverse('jcr:admin-details-data'), {
+                'round': round_id, 'draw': 1, 'start': 0, 'length': 25,
+            })],
+            'admin-details-export': [
+                (self.admin, 'get', reverse('jcr:admin-details-export'), {'round': round_id}),
+                (self.admin, 'get', reverse('jcr:admin-details-export'), {'round': round_id, 'format': 'xlsx'}),
+            ],
+            'admin-summary': [(self.admin, 'get', reverse('jcr:admin-summary', args=(round_id,)), {})],
+            'admin-status-set': [(self.admin, 'post', reverse('jcr:admin-status-set', args=(round_id,)), {
+                'status': ContributionRound.STATUS_CLOSED,
+            })],
+            'admin-transfer-bill': [(self.admin, 'post', reverse('jcr:admin-transfer-bill', args=(round_id,)), {})],
+            'admin-transfer-status': [(self.admin, 'get', reverse('jcr:admin-transfer-status', args=(round_id,)), {})],
+            'admin-metrics': [(self.admin, 'get', reverse('jcr:admin-metrics'), {})],
+        }
+
+    def run_requests(self, size):
+        """
+        :return: dict url name -> list of QueryRecorder
+        """
+        recorders = {}
+        for name, requests in self.get_requests(size).items():
+            recorders[name] = []
+            for member, method, url, data in requests:
+                self.client.force_login(member.user)
+                if method == 'get':
+                    # stored statistics and the content types are created once
+                    getattr(self.client, method)(url, data)
+                # cold caches, so that both sizes run the same code
+                cache.clear()
+                recorder = QueryRecorder()
+                with connection.execute_wrapper(recorder):
+                    response = getattr(self.client, method)(url, data)
+                    # streamed responses query while they are consumed
+                    b''.join(getattr(response, 'streaming_content', []))
+                self.assertLess(response.status_code, 400, f'{method.upper()} {url}')
+                recorders[name].append(recorder)
+        # reopen the round closed by admin-status-set
+        self.contribution_round.refresh_from_db()
+        self.contribution_round.status = ContributionRound.STATUS_ACTIVE
+        self.contribution_round.save()
+        return recorders
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(self.get_requests(0)))
+        for pattern in urls.urlpatterns:
+            self.assertIsNotNone(getattr(pattern.callback, 'query_budget', None), pattern.name)
+
+    def test_query_budgets(self):
+        small = self.run_requests(0)
+        self.add_data(8)
+        large = self.run_requests(1)
+        callbacks = {pattern.name: pattern.callback for pattern in urls.urlpatterns}
+        for name, recorders in small.items():
+            budget = callbacks[name].query_budget
+            for recorder, grown in zip(recorders, large[name]):
+                with self.subTest(name):
+                    self.assertLessEqual(len(recorder), budget, f'{name} exceeds its budget:\n{recorder.report()}')
+                    self.assertEqual(len(grown), len(recorder), f'{name} grows with the data:\n{grown.report(recorder)}')
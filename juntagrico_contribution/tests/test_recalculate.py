@@ -0,0 +1,69 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from . import ContributionTestCase
+from ..models import ContributionRoundStats
+from ..statistics import RoundStatistics
+
+
+class RecalculatePricesTests(ContributionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.selection = self.select(self.sub, self.option2.pk)
+        self.other = self.select(self.sub2, 'other', 1500)
+        self.option2.multiplier = 1.2
+        self.option2.save()
+
+    def test_dry_run(self):
+        changes = self.contribution_round.recalculate_prices(dry_run=True)
+        self.assertEqual([(change.selection, change.old_price, change.new_price) for change in changes], [
+            (self.selection, Decimal(1000), Decimal(1200))
+        ])
+        self.selection.refresh_from_db()
+        self.assertEqual(self.selection.price, Decimal(1000))
+
+    def test_recalculate(self):
+        self.contribution_round.get_statistics()
+        modified_at = self.selection.modified_at
+        with self.assertNumQueries(9):
+            changes = self.contribution_round.recalculate_prices(batch_size=1)
+        self.assertEqual(len(changes), 1)
+        self.selection.refresh_from_db()
+        self.assertEqual(self.selection.price, Decimal(1200))
+        self.assertGreater(self.selection.modified_at, modified_at)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.price, Decimal(1500))
+        self.assertTrue(ContributionRoundStats.objects.get(round=self.contribution_round).stale)
+        self.assertEqual(
+            self.contribution_round.get_statistics().differences(RoundStatistics.compute(self.contribution_round)), []
+        )
+        # prices are up to date
+        self.assertEqual(self.contribution_round.recalculate_prices(), [])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('recalculate_contribution_prices', '--dry-run', verbosity=2, stdout=out)
+        self.assertIn(f'selection {self.selection.pk}: 1000.00 -> 1200.00', out.getvalue())
+        self.assertIn('1 prices would change, net +200.00', out.getvalue())
+        out = StringIO()
+        call_command('recalculate_contribution_prices', str(self.contribution_round.pk), stdout=out)
+        self.assertIn('1 prices changed, net +200.00', out.getvalue())
+        self.selection.refresh_from_db()
+        self.assertEqual(self.selection.price, Decimal(1200))
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin.user)
+        response = self.client.post(reverse('admin:juntagrico_contribution_contributionround_changelist'), {
+            'action': 'preview_recalculate_prices', '_selected_action': [self.contribution_round.pk],
+        }, follow=True)
+        self.assertContains(response, '1 Preise würden sich ändern')
+        self.selection.refresh_from_db()
+        self.assertEqual(self.selection.price, Decimal(1000))
+        self.client.post(reverse('admin:juntagrico_contribution_contributionround_changelist'), {
+            'action': 'recalculate_prices', '_selected_action': [self.contribution_round.pk],
+        })
+        self.selection.refresh_from_db()
+        self.assertEqual(self.selection.price, Decimal(1200))
@@ -0,0 +1,60 @@
+import datetime
+from decimal import Decimal
+
+from django.urls import reverse
+
+from . import ContributionTestCase
+from ..models import ContributionRound, ContributionSelection
+
+
+class SnapshotTests(ContributionTestCase):
+    def set_status(self, status):
+        self.assertPost(
+            reverse('jcr:admin-status-set', args=(self.contribution_round.id,)), {'status': status},
+            code=302, member=self.admin
+        )
+        self.contribution_round.refresh_from_db()
+
+    def test_close_and_reactivate(self):
+        subscriptions = set(self.contribution_round.subscriptions())
+        total_nominal = self.contribution_round.get_total_nominal()
+        self.set_status(ContributionRound.STATUS_CLOSED)
+        self.assertTrue(self.contribution_round.has_snapshot)
+        self.assertEqual(
+            set(self.contribution_round.snapshot.values_list('part', flat=True)),
+            set(self.contribution_round.subscription_parts().values_list('id', flat=True)),
+        )
+        # later changes do not affect the closed round
+        self.sub.deactivate(datetime.date.today())
+        self.sub_type2.price = 5000
+        self.sub_type2.save()
+        self.assertEqual(set(self.contribution_round.subscriptions()), subscriptions)
+        self.assertEqual(self.contribution_round.get_total_nominal(), total_nominal)
+
+        self.set_status(ContributionRound.STATUS_ACTIVE)
+        self.assertFalse(self.contribution_round.has_snapshot)
+        self.assertFalse(self.contribution_round.snapshot.exists())
+        self.assertNotIn(self.sub, self.contribution_round.subscriptions())
+
+    def test_closed_round_prices(self):
+        self.set_status(ContributionRound.STATUS_CLOSED)
+        selection = ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub, price=1200)
+        self.assertEqual(selection.get_nominal_price(), Decimal(1000))
+        self.assertEqual(self.contribution_round.selections.with_nominal_price().get().nominal_price, Decimal(1000))
+        self.assertEqual(self.contribution_round.get_total_unselected(), Decimal(2000))
+        # snapshot is repriced when the default option changes
+        self.contribution_round.default_amount = self.option1
+        self.contribution_round.save()
+        self.assertEqual(self.contribution_round.get_total_unselected(), Decimal(1600))
+        self.option1.multiplier = 0.5
+        self.option1.save()
+        self.assertEqual(self.contribution_round.get_total_unselected(), Decimal(1000))
+        # from the nominal prices of the snapshot, not the current prices of the types
+        self.sub_type.price = 5000
+        self.sub_type.save()
+        self.option1.multiplier = 0.6
+        self.option1.save()
+        self.assertEqual(self.contribution_round.get_total_unselected(), Decimal(1200))
+        prices = self.contribution_round.get_price_matrix()
+        self.assertEqual(prices.nominal(self.sub.pk), Decimal(1000))
+        self.assertEqual(prices.get(self.sub.pk, self.option1), Decimal(600))
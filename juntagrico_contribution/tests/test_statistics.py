@@ -0,0 +1,106 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from . import ContributionTestCase
+from ..models import BillTransferMark, ContributionRound, ContributionRoundStats, ContributionSelection, \
+    ContributionCondition
+from ..statistics import RoundStatistics
+
+
+class RoundStatsTests(ContributionTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.contribution_round.default_amount = cls.option1
+        cls.contribution_round.save()
+
+    def assertStatsUpToDate(self):
+        stats = ContributionRoundStats.objects.get(round=self.contribution_round)
+        self.assertFalse(stats.stale)
+        self.assertEqual(stats.to_statistics().differences(RoundStatistics.compute(self.contribution_round)), [])
+
+    def test_stored_statistics(self):
+        self.contribution_round.get_statistics()
+        with self.assertNumQueries(2):
+            stats = self.contribution_round.get_statistics()
+            self.assertEqual([count for _, count in stats.options], [0, 0])
+
+    def test_incremental_update(self):
+        self.contribution_round.get_statistics()
+        self.select(self.sub, self.option1.pk)
+        self.assertStatsUpToDate()
+        self.select(self.sub2, 'other', 900)
+        self.assertStatsUpToDate()
+        self.select(self.sub, 'other', 1500)
+        self.assertStatsUpToDate()
+        self.select(self.sub2, 'other', 950)
+        self.assertStatsUpToDate()
+        self.select(self.sub2, self.option2.pk)
+        self.assertStatsUpToDate()
+        # not a valid selection
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub3, price=100)
+        self.assertStatsUpToDate()
+        self.contribution_round.selections.get(subscription=self.sub).delete()
+        self.assertStatsUpToDate()
+
+    def test_eligibility_of_single_subscription(self):
+        self.contribution_round.get_statistics()
+        with CaptureQueriesContext(connection) as queries:
+            self.select(self.sub, self.option1.pk)
+        # not the scan of all subscriptions of the round
+        self.assertFalse([query for query in queries if 'DISTINCT' in query['sql']])
+        self.assertStatsUpToDate()
+
+    def test_mark_stale(self):
+        self.contribution_round.get_statistics()
+        ContributionCondition.objects.create(option=self.option1, subscription_type=self.sub_type, price=Decimal(10))
+        self.assertTrue(ContributionRoundStats.objects.get(round=self.contribution_round).stale)
+        # rebuilt on next access
+        self.assertEqual(self.contribution_round.get_statistics().total_unselected, Decimal(10) * 2 + 1000 * Decimal('0.8'))
+        self.assertStatsUpToDate()
+
+    def test_closed_round_after_price_change(self):
+        self.contribution_round.status = ContributionRound.STATUS_CLOSED
+        self.contribution_round.save()
+        self.contribution_round.get_statistics()
+        # the snapshot keeps the prices of the closed round
+        self.sub_type.price = 5000
+        self.sub_type.save()
+        ContributionSelection.objects.create(round=self.contribution_round, subscription=self.sub, price=1200)
+        self.assertStatsUpToDate()
+        selection = self.contribution_round.selections.get()
+        selection.selected_option = self.option2
+        selection.save()
+        self.assertStatsUpToDate()
+        selection.delete()
+        self.assertStatsUpToDate()
+
+    def test_unrelated_subscription_changes(self):
+        self.contribution_round.get_statistics()
+        BillTransferMark.objects.create(round=self.contribution_round, business_year_id=1)
+        self.sub.depot = self.depot2
+        self.sub.save()
+        self.sub.parts.first().save()
+        self.sub_type.name = 'Neuer Name'
+        self.sub_type.save()
+        self.assertStatsUpToDate()
+        self.assertTrue(BillTransferMark.objects.exists())
+        # eligibility may change
+        self.sub.cancellation_date = datetime.date.today()
+        self.sub.save()
+        self.assertTrue(ContributionRoundStats.objects.get(round=self.contribution_round).stale)
+        self.assertFalse(BillTransferMark.objects.exists())
+
+    def test_rebuild_command(self):
+        self.contribution_round.get_statistics()
+        ContributionRoundStats.objects.update(subscription_count=99)
+        out = StringIO()
+        call_command('rebuild_contribution_stats', '--check', stdout=out)
+        self.assertIn('subscription_count drifted: stored 99, actual 3', out.getvalue())
+        call_command('rebuild_contribution_stats', stdout=StringIO())
+        self.assertStatsUpToDate()
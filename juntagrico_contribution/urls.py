@@ -10,7 +10,11 @@ urlpatterns = [
     # admin
     path('manage/list/', admin.list, name='admin-list'),
     path('manage/details/', admin.details, name='admin-details'),
+    path('manage/details/data', admin.details_data, name='admin-details-data'),
+    path('manage/details/export', admin.details_export, name='admin-details-export'),
     path('manage/<int:round_id>/summary', admin.summary, name='admin-summary'),
     path('manage/<int:round_id>/status/set', admin.set_status, name='admin-status-set'),
     path('manage/<int:round_id>/transfer/bill', admin.transfer_bill, name='admin-transfer-bill'),
+    path('manage/<int:round_id>/transfer/status', admin.transfer_status, name='admin-transfer-status'),
+    path('manage/metrics', admin.metrics, name='admin-metrics'),
 ]
@@ -0,0 +1,10 @@
+def query_budget(queries):
+    """
+    declare the maximum number of queries of a view. the count must not depend on the amount of data.
+    enforced for every url by tests/test_query_budget.py. raising a budget is a deliberate change.
+    :param queries: maximum number of queries of a request, including session, user and menu
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
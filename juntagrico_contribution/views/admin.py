@@ -1,36 +1,61 @@
+import tempfile
+
 from django.contrib import messages
-from django.db.models import Prefetch
-from django.http import Http404
+from django.db import transaction
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, \
+    StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.defaultfilters import date, floatformat, yesno
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import permission_required
 from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.http import content_disposition_header
 from django.views.decorators.http import require_POST
 from django.utils.translation import gettext as _
 
+from juntagrico_contribution.details import co_members, filter_contact_me, filter_option, get_total_price, \
+    search_members, set_can_impersonate, set_content, subscriptions_with_details, with_selection
+from juntagrico_contribution.export import get_header, get_rows, stream_csv, write_xlsx
 from juntagrico_contribution.forms import RoundForm, BillTransferForm
-from juntagrico_contribution.models import ContributionRound, ContributionSelection
+from juntagrico_contribution.models import ContributionRound, BillTransferJob
+from juntagrico_contribution.instrumentation import instrumented, is_enabled, to_prometheus
+from juntagrico_contribution.views import query_budget
 
 
+@instrumented('jcr:admin-list')
 @permission_required('juntagrico_contribution.view_contributionround')
+@query_budget(14)
 def list(request):
+    # all rounds with their progress in one query
+    rounds = {status: [] for status, label in ContributionRound.DISPLAY_OPTIONS}
+    for contribution_round in ContributionRound.objects.with_metrics().order_by('pk'):
+        rounds[contribution_round.status].append(contribution_round)
     return render(request, 'jcr/management/list.html', {
-        'draft': ContributionRound.objects.filter(status=ContributionRound.STATUS_DRAFT),
-        'active': ContributionRound.objects.filter(status=ContributionRound.STATUS_ACTIVE),
-        'closed': ContributionRound.objects.filter(status=ContributionRound.STATUS_CLOSED)
+        'draft': rounds[ContributionRound.STATUS_DRAFT],
+        'active': rounds[ContributionRound.STATUS_ACTIVE],
+        'closed': rounds[ContributionRound.STATUS_CLOSED],
     })
 
 
+@instrumented('jcr:admin-summary')
 @permission_required('juntagrico_contribution.view_contributionround')
+@query_budget(17)
 def summary(request, round_id):
     contribution_round = get_object_or_404(ContributionRound, id=round_id)
     return render(request, 'jcr/management/summary.html', {
         'round': contribution_round,
+        'stats': contribution_round.get_statistics(),
         'bill_transfer_form': BillTransferForm(),
+        'bill_transfer_job': contribution_round.bill_transfer_jobs.order_by('-pk').first(),
     })
 
 
+@instrumented('jcr:admin-status-set')
 @require_POST
 @permission_required('juntagrico_contribution.change_contributionround')
+@query_budget(13)
 def set_status(request, round_id):
     contribution_round = get_object_or_404(ContributionRound, id=round_id)
 
@@ -44,49 +69,186 @@ def set_status(request, round_id):
               'weil bereits eine andere Beitragsrunde ({}) aktiv ist.').format(contribution_round.name)
         )
     else:
-        contribution_round.status = new_status
-        contribution_round.save()
+        with transaction.atomic():
+            # closing the round creates a snapshot, reactivating it discards the snapshot
+            contribution_round.status = new_status
+            contribution_round.save()
 
     return redirect(request.POST.get('next', reverse('jcr:admin-summary', args=(contribution_round.id,))))
 
 
+@instrumented('jcr:admin-transfer-bill')
 @require_POST
 @permission_required('juntagrico_contribution.view_contributionround')
 @permission_required('juntagrico_contribution.change_contributionround')
+@query_budget(4)
 def transfer_bill(request, round_id):
     contribution_round = get_object_or_404(ContributionRound, id=round_id)
     form = BillTransferForm(request.POST)
-    if form.is_valid():
-        if request.POST.get('undo'):
-            form.delete(contribution_round)
-            messages.success(request, _('Rechnungs-Einträge dieser Beitragsrunde entfernt.'))
+    if contribution_round.bill_transfer_jobs.pending().exists():
+        messages.error(request, _('Es läuft bereits eine Übertragung für diese Beitragsrunde.'))
+    elif form.is_valid():
+        action = BillTransferJob.ACTION_UNDO if request.POST.get('undo') else BillTransferJob.ACTION_TRANSFER
+        if form.create_job(contribution_round, action) is None:
+            messages.error(request, _('Übertragung fehlgeschlagen: Juntagrico Billing ist nicht aktiv.'))
+        elif action == BillTransferJob.ACTION_UNDO:
+            messages.success(request, _('Das Entfernen der Rechnungs-Einträge dieser Beitragsrunde wurde gestartet.'))
         else:
-            failed = form.save(contribution_round)
-            if failed is True:
-                messages.error(request, _('Übertragung fehlgeschlagen: Juntagrico Billing ist nicht aktiv.'))
-            elif len(failed) > 0:
-                messages.error(request, _('{} Einträge konnten nicht erstellt werden. '
-                                          'Wurden die Rechnungen schon generiert?').format(len(failed)))
-            else:
-                messages.success(request, _('Übertragung erfolgreich abgeschlossen'))
+            messages.success(request, _('Die Übertragung in die Rechnungen wurde gestartet.'))
     return redirect(request.POST.get('next', reverse('jcr:admin-summary', args=(contribution_round.id,))))
 
 
+@instrumented('jcr:admin-transfer-status')
+@permission_required('juntagrico_contribution.view_contributionround')
+@query_budget(3)
+def transfer_status(request, round_id):
+    job = BillTransferJob.objects.filter(round_id=round_id).order_by('-pk').first()
+    return JsonResponse({'job': job.to_json() if job else None})
+
+
+@instrumented('jcr:admin-details')
 @permission_required('juntagrico_contribution.view_contributionround')
+@query_budget(16)
 def details(request):
     round_form = RoundForm(request.GET)
     if not round_form.is_valid():
         raise Http404()
-    contribution_round = round_form.cleaned_data['round']
-
     return render(request, 'jcr/management/details.html', {
-        'round': contribution_round,
+        'round': round_form.cleaned_data['round'],
         'round_form': round_form,
-        'object_list': contribution_round.subscriptions().prefetch_related(
-            Prefetch(
-                'contributions',
-                queryset=ContributionSelection.objects.filter(round=contribution_round),
-                to_attr='current_contribution'
-            )
-        ),
     })
+
+
+@instrumented('jcr:admin-details-data')
+@permission_required('juntagrico_contribution.view_contributionround')
+@query_budget(11)
+def details_data(request):
+    """
+    returns the rows of the details table for datatables, filtered, sorted and paged in SQL
+    """
+    round_form = RoundForm(request.GET)
+    if not round_form.is_valid():
+        raise Http404()
+    contribution_round = round_form.cleaned_data['round']
+    try:
+        draw = int(request.GET.get('draw', 0))
+        start = max(int(request.GET.get('start', 0)), 0)
+        length = int(request.GET.get('length', 25))
+    except ValueError:
+        return HttpResponseBadRequest()
+    if length < 1:
+        # includes -1 (all) of datatables, which is not in the page length menu of the details table
+        return HttpResponseBadRequest()
+    length = min(length, 1000)  # limit maximum size
+
+    all_subscriptions = contribution_round.subscriptions()
+
+    # filter by search
+    filtered = with_selection(all_subscriptions, contribution_round)
+    if search_option := request.GET.get('columns[0][search][value]'):
+        filtered = filter_option(filtered, search_option)
+    if search_contact_me := request.GET.get('columns[2][search][value]'):
+        filtered = filter_contact_me(filtered, search_contact_me)
+    if search_value := request.GET.get('search[value]'):
+        filtered = search_members(filtered, search_value)
+
+    # sort results
+    columns = {
+        '0': 'jcr_selection__selected_option__sort_order',
+        '1': 'jcr_selection__price',
+        '2': 'jcr_selection__contact_me',
+        '3': 'jcr_selection__modification_date',
+    }
+    ordering = []
+    order = 0
+    while column := request.GET.get(f'order[{order}][column]'):
+        column = columns.get(column)
+        if column:
+            direction = request.GET.get(f'order[{order}][dir]')
+            ordering.append(f'-{column}' if direction == 'desc' else column)
+        order += 1
+    filtered = filtered.order_by(*(ordering or ['-' + columns['3']]), 'pk')
+
+    # write to data
+    page = subscriptions_with_details(contribution_round, filtered[start:start + length])
+    set_content(page)
+    for subscription in page:
+        subscription.jcr_co_members = co_members(subscription)
+    set_can_impersonate(request, [
+        member for subscription in page
+        for member in [subscription.primary_member, *subscription.jcr_co_members] if member
+    ])
+    can_view_selection = request.user.has_perm('juntagrico_contribution.view_contributionselection') \
+        or request.user.has_perm('juntagrico_contribution.change_contributionselection')
+    data = []
+    for subscription in page:
+        if subscription.current_contribution:
+            selection = subscription.current_contribution[0]
+            option = selection.selected_option or _('Anderer Betrag')
+            if can_view_selection:
+                option = format_html('<a href="{}">{}</a>', reverse(
+                    'admin:juntagrico_contribution_contributionselection_change', args=[selection.pk]
+                ), option)
+            else:
+                option = format_html('<span>{}</span>', option)
+            row = [
+                option,
+                f'{floatformat(selection.price, "2g")} ({floatformat(selection.get_nominal_price(), "2g")})',
+                yesno(selection.contact_me, _('Ja,Nein')),
+                date(selection.modification_date, 'Y-m-d'),
+            ]
+        else:
+            row = [_('Kein Gebot'), '-', '-', '-']
+        data.append(row + [
+            render_to_string('juntagrico/manage/subscription/snippets/display_linked.html', {
+                'subscription': subscription
+            }, request),
+            format_html_join('', '<div>{}</div>', ((item,) for item in subscription.content_strings())),
+            render_to_string('jcr/snippets/contact.html', {'subscription': subscription}, request),
+        ])
+
+    return JsonResponse({
+        'draw': draw,
+        'recordsTotal': all_subscriptions.count(),
+        'recordsFiltered': filtered.count(),
+        'total': float(get_total_price(contribution_round, filtered)),
+        'data': data
+    })
+
+
+@instrumented('jcr:admin-details-export')
+@permission_required('juntagrico_contribution.view_contributionround')
+@query_budget(5)
+def details_export(request):
+    """
+    export the details table of a round as csv (streamed) or xlsx
+    """
+    round_form = RoundForm(request.GET)
+    if not round_form.is_valid():
+        raise Http404()
+    contribution_round = round_form.cleaned_data['round']
+    if request.GET.get('format') == 'xlsx':
+        # the xlsx zip archive is written to disk, as it can not be streamed
+        file = tempfile.TemporaryFile()
+        write_xlsx(get_header(), get_rows(contribution_round), file)
+        file.seek(0)
+        return FileResponse(
+            file, as_attachment=True, filename=f'{contribution_round.name}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+    response = StreamingHttpResponse(
+        stream_csv(get_header(), get_rows(contribution_round)), content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = content_disposition_header(True, f'{contribution_round.name}.csv')
+    return response
+
+
+@staff_member_required
+@query_budget(2)
+def metrics(request):
+    """
+    metrics of this process in the prometheus text format, if JCR_INSTRUMENTATION is enabled
+    """
+    if not is_enabled():
+        raise Http404()
+    return HttpResponse(to_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -4,11 +4,15 @@ from django.contrib.auth.decorators import login_required
 from juntagrico.view_decorators import highlighted_menu
 
 from juntagrico_contribution.forms import ContributionSelectionForm
+from juntagrico_contribution.instrumentation import instrumented
 from juntagrico_contribution.models import ContributionRound
+from juntagrico_contribution.views import query_budget
 
 
+@instrumented('jcr:select')
 @login_required
 @highlighted_menu('contribution')
+@query_budget(30)
 def select(request):
     member = request.user.member
     # check if member has a subscription at all
@@ -16,10 +20,10 @@ def select(request):
     if not subscription:
         return redirect('subscription-landing')
     # check if subscription is relevant for this round
-    contribution_round = ContributionRound.objects.filter(status=ContributionRound.STATUS_ACTIVE).first()
+    contribution_round = ContributionRound.get_active()
     if not contribution_round:
         raise Http404()
-    if not contribution_round.subscriptions().filter(pk=subscription.pk).exists():
+    if not contribution_round.is_eligible(subscription):
         return render(request, "jcr/not_applicable.html", {'round': contribution_round})
     # check if user is primary member
     if subscription.primary_member != member:
@@ -42,8 +46,10 @@ def select(request):
     })
 
 
+@instrumented('jcr:view')
 @login_required
 @highlighted_menu('contribution')
+@query_budget(25)
 def view(request):
     member = request.user.member
     subscription = member.subscription_future or member.subscription_current
@@ -18,7 +18,7 @@ INSTALLED_APPS = [
     'crispy_forms',
     'adminsortable2',
     'juntagrico_contribution',
-    # 'juntagrico_billing',
+    'juntagrico_billing',
     'juntagrico',
     'import_export',
     'impersonate',
@@ -29,6 +29,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': 'yourdatabasename.db',
+        # on disk, so that the threads of the concurrency tests can share the test database
+        'TEST': {'NAME': 'test_yourdatabasename.db'},
     }
 }
 